@@ -1,15 +1,45 @@
 import asyncio
-import json
+import random
+from contextlib import nullcontext
 from urllib.parse import quote
 
 import msgpack
 import aiohttp
+import orjson
 from ops.data_ops import sort_list_dict
 from ops.log_ops import get_logger
 """this module is optimized for low memory and bandwidth usage"""
 
 
-async def get_list_of(key, peer, port, fail_storage, logger, semaphore, compress=None):
+def make_session():
+    """one pooled session per compound call so repeated requests to a peer reuse keep-alive connections,
+    sessions are bound to the event loop that created them, so they are not shared across asyncio.run calls"""
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=100, limit_per_host=4, ttl_dns_cache=300),
+                                 timeout=aiohttp.ClientTimeout(total=5))
+
+
+async def fetch(session, url_construct, output="json", retries=2):
+    """get url and parse it as json, msgpack or text, failed attempts are retried with exponential backoff
+    and jitter so gathered requests do not retry against a recovering peer in lockstep, last failure raises"""
+    delay = 0.1
+    for attempt in range(retries):
+        try:
+            async with session.get(url_construct) as response:
+                if output == "msgpack":
+                    return msgpack.unpackb(await response.read())
+                elif output == "json":
+                    return await response.json(loads=orjson.loads, content_type=None)
+                else:
+                    return await response.text()
+
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(delay + random.random() * delay)
+            delay = min(delay * 2, 1.5)
+
+
+async def get_list_of(key, peer, port, fail_storage, logger, semaphore, session, compress=None):
     """method compounded by compound_get_list_of, fail storage external by reference (obj)"""
     """bandwith usage of this grows exponentially with number of peers"""
     """peers include themselves in their peer lists"""
@@ -21,13 +51,10 @@ async def get_list_of(key, peer, port, fail_storage, logger, semaphore, compress
 
     try:
         async with semaphore:
-            
-            async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url_construct) as response:
-                    if compress == "msgpack":
-                        fetched = msgpack.unpackb(await (response.read()))
-                    else:
-                        fetched = json.loads(await response.text())[key]
+            if compress == "msgpack":
+                fetched = await fetch(session, url_construct, output="msgpack")
+            else:
+                fetched = (await fetch(session, url_construct))[key]
         return fetched
 
     except Exception as e:
@@ -38,37 +65,28 @@ async def get_list_of(key, peer, port, fail_storage, logger, semaphore, compress
 async def compound_get_list_of(key, entries, port, logger, fail_storage, semaphore, compress=None):
     """returns a list of lists of raw peers from multiple peers at once"""
 
-    result = list(
-        filter(
-            None,
-            await asyncio.gather(
-                *[get_list_of(key, entry, port, fail_storage, logger, semaphore, compress) for entry in entries]
-            ),
+    async with make_session() as session:
+        result = list(
+            filter(
+                None,
+                await asyncio.gather(
+                    *[get_list_of(key, entry, port, fail_storage, logger, semaphore, session, compress) for entry in entries]
+                ),
+            )
         )
-    )
-
-    success_storage = []
-    for entry in result:
-        if entry not in success_storage:
-            success_storage.extend(entry)
 
-    if isinstance(success_storage, list):
-        success_storage = sort_list_dict(success_storage)
+    """flatten, then deduplicate by equality like every other pool"""
+    return sort_list_dict([item for entry in result for item in entry])
 
-    return success_storage
 
-
-async def get_url(peer, port, url, logger, fail_storage, semaphore, compress=None):
+async def get_url(peer, port, url, logger, fail_storage, semaphore, session, compress=None):
     """method compounded by compound_get_url"""
 
     url_construct = f"http://{peer}:{port}/{url}"
     try:
         async with semaphore:
-            
-            async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url_construct) as response:
-                    fetched = await response.text()
-                    return peer, fetched
+            fetched = await fetch(session, url_construct, output="text")
+            return peer, fetched
 
     except Exception as e:
         if peer not in fail_storage:
@@ -77,12 +95,13 @@ async def get_url(peer, port, url, logger, fail_storage, semaphore, compress=Non
 
 async def compound_get_url(ips, port, url, logger, fail_storage, semaphore, compress=None):
     """returns result of urls with arbitrary data past slash"""
-    result = list(
-        filter(
-            None,
-            await asyncio.gather(*[get_url(ip, port, url, logger, fail_storage, semaphore) for ip in ips]),
+    async with make_session() as session:
+        result = list(
+            filter(
+                None,
+                await asyncio.gather(*[get_url(ip, port, url, logger, fail_storage, semaphore, session) for ip in ips]),
+            )
         )
-    )
 
     result_dict = {}
     for entry in result:
@@ -91,33 +110,32 @@ async def compound_get_url(ips, port, url, logger, fail_storage, semaphore, comp
     return result_dict
 
 
-async def send_transaction(peer, port, logger, fail_storage, transaction, semaphore, compress=None):
+async def send_transaction(peer, port, logger, fail_storage, transaction, semaphore, session, compress=None):
     """method compounded by compound_send_transaction"""
 
-    url_construct = f"http://{peer}:{port}/submit_transaction?data={quote(json.dumps(transaction))}"
+    url_construct = f"http://{peer}:{port}/submit_transaction?data={quote(orjson.dumps(transaction))}"
 
     try:
         async with semaphore:
-            
-            async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url_construct) as response:
-                    fetched = json.loads(await response.text())["message"]
-                    return peer, fetched
+            fetched = (await fetch(session, url_construct))["message"]
+            return peer, fetched
 
     except Exception as e:
         if peer not in fail_storage:
             logger.error(f"Compounder: Failed to send transaction to {url_construct} {e}")
             fail_storage.append(peer)
 
-async def compound_send_transaction(ips, port, logger, fail_storage, transaction, semaphore, compress=None):
-    """returns a list of dicts where ip addresses are keys"""
-    result = list(
-        filter(
-            None,
-            await asyncio.gather(
-                *[send_transaction(ip, port, logger, fail_storage, transaction, semaphore) for ip in ips]),
+async def compound_send_transaction(ips, port, logger, fail_storage, transaction, semaphore, compress=None,
+                                    session=None):
+    """returns a list of dicts where ip addresses are keys, a session passed in is reused and left open"""
+    async with nullcontext(session) if session else make_session() as session:
+        result = list(
+            filter(
+                None,
+                await asyncio.gather(
+                    *[send_transaction(ip, port, logger, fail_storage, transaction, semaphore, session) for ip in ips]),
+            )
         )
-    )
 
     result_dict = {}
     for entry in result:
@@ -126,7 +144,7 @@ async def compound_send_transaction(ips, port, logger, fail_storage, transaction
     return result_dict
 
 
-async def get_status(peer, port, logger, fail_storage, semaphore, compress=None):
+async def get_status(peer, port, logger, fail_storage, semaphore, session, compress=None):
     """method compounded by compound_get_status_pool"""
 
     if compress:
@@ -136,29 +154,41 @@ async def get_status(peer, port, logger, fail_storage, semaphore, compress=None)
 
     try:
         async with semaphore:
-            
-            async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url_construct) as response:
-                    if compress == "msgpack":
-                        fetched = msgpack.unpackb(await response.read())
-                    else:
-                        fetched = json.loads(await response.text())
-
-                    return peer, fetched
+            if compress == "msgpack":
+                fetched = await fetch(session, url_construct, output="msgpack")
+            else:
+                fetched = await fetch(session, url_construct)
+            return peer, fetched
 
     except Exception as e:
         if peer not in fail_storage:
             logger.error(f"Compounder: Failed to get status from {url_construct} {e}")
             fail_storage.append(peer)
 
-async def compound_get_status_pool(ips, port, logger, fail_storage, semaphore, compress=None):
-    """returns a list of dicts where ip addresses are keys"""
-    result = list(
-        filter(
-            None,
-            await asyncio.gather(*[get_status(ip, port, logger, fail_storage, semaphore) for ip in ips]),
+async def gather_until(coroutines, deadline):
+    """like gather, but peers still pending after the deadline are cancelled and left out of the result"""
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    if not tasks:
+        return []
+
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    return [task.result() for task in tasks if task in done]
+
+
+async def compound_get_status_pool(ips, port, logger, fail_storage, semaphore, compress=None, deadline=15):
+    """returns a list of dicts where ip addresses are keys, slow peers are dropped after deadline seconds"""
+    async with make_session() as session:
+        result = list(
+            filter(
+                None,
+                await gather_until([get_status(ip, port, logger, fail_storage, semaphore, session) for ip in ips],
+                                   deadline=deadline),
+            )
         )
-    )
 
     result_dict = {}
     for entry in result:
@@ -167,7 +197,7 @@ async def compound_get_status_pool(ips, port, logger, fail_storage, semaphore, c
     return result_dict
 
 
-async def announce_self(peer, port, my_ip, logger, fail_storage, semaphore):
+async def announce_self(peer, port, my_ip, logger, fail_storage, semaphore, session):
     """method compounded by compound_announce_self"""
 
     url_construct = (
@@ -176,11 +206,8 @@ async def announce_self(peer, port, my_ip, logger, fail_storage, semaphore):
 
     try:
         async with semaphore:
-            
-            async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(url_construct) as response:
-                    fetched = await response.text()
-                    return fetched
+            fetched = await fetch(session, url_construct, output="text")
+            return fetched
 
     except Exception:
         if peer not in fail_storage:
@@ -189,14 +216,15 @@ async def announce_self(peer, port, my_ip, logger, fail_storage, semaphore):
 
 
 async def compound_announce_self(ips, port, my_ip, logger, fail_storage, semaphore):
-    result = list(
-        filter(
-            None,
-            await asyncio.gather(
-                *[announce_self(ip, port, my_ip, logger, fail_storage, semaphore) for ip in ips]
-            ),
+    async with make_session() as session:
+        result = list(
+            filter(
+                None,
+                await asyncio.gather(
+                    *[announce_self(ip, port, my_ip, logger, fail_storage, semaphore, session) for ip in ips]
+                ),
+            )
         )
-    )
     return result
 
 
@@ -40,19 +40,33 @@ def test_self_port(ip, port):
             return False
 
 
-def get_config(config_path: str = f"{get_home()}/private/config.dat"):
+config_cache = {}
+"""parsed config files by path, kept for a few seconds so per-request lookups do not reparse the file"""
+
+
+def get_config(config_path: str = f"{get_home()}/private/config.dat", ttl: int = 10):
+    cached = config_cache.get(config_path)
+    if cached and cached["expires"] > time.monotonic():
+        return cached["config"]
+
     with open(config_path) as infile:
-        return json.loads(infile.read())
+        config = json.loads(infile.read())
+
+    config_cache[config_path] = {"config": config,
+                                 "expires": time.monotonic() + ttl}
+    return config
 
 
 def update_config(new_config: dict, config_path: str = f"{get_home()}/private/config.dat"):
-    config = get_config()
+    config = get_config(config_path).copy()
     for key, value in new_config.items():
         config[key] = value
 
     with open(config_path, "w") as outfile:
         json.dump(config, outfile)
 
+    config_cache.pop(config_path, None)
+
 
 def create_config(ip: str, config_path: str = f"{get_home()}/private/config.dat"):
     config_contents = {
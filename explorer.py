@@ -161,7 +161,7 @@ class StatsHandler(BaseHandler):
         transaction_buffer = json.loads(requests.get(f"{nado_node}/transaction_buffer").text)
         user_transaction_buffer = json.loads(requests.get(f"{nado_node}/user_transaction_buffer").text)
         peers = json.loads(requests.get(f"{nado_node}/peers").text)
-        peers_buffer = json.loads(requests.get(f"{nado_node}/peers_buffer").text)
+        peers_buffer = json.loads(requests.get(f"{nado_node}/peer_buffer").text)
         unreachable = json.loads(requests.get(f"{nado_node}/unreachable").text)
         block_producers = json.loads(requests.get(f"{nado_node}/block_producers").text)
         penalties = json.loads(requests.get(f"{nado_node}/penalties").text)
@@ -3,6 +3,8 @@ import asyncio
 import json
 import random
 
+import orjson
+
 from Curve25519 import from_private_key
 from compounder import compound_send_transaction
 from config import get_timestamp_seconds, create_config, config_found, get_port
@@ -17,9 +19,9 @@ from ops.transaction_ops import create_transaction, draft_transaction, to_raw_am
     get_target_block, get_base_fee
 import requests
 
-def send_transaction(transaction, ips, logger):
-    print(json.dumps(transaction, indent=4))
-    if not args.auto:
+def send_transaction(transaction, ips, logger, confirm=True):
+    print(orjson.dumps(transaction, option=orjson.OPT_INDENT_2).decode())
+    if confirm:
         input("Press any key to continue")
 
     fails = []
@@ -44,6 +46,7 @@ if __name__ == "__main__":
     parser.add_argument("--fee", help="<number> Fee to spend", default=False)
     parser.add_argument("--target", help="<number> Target block number", default=False)
     parser.add_argument("--auto", help="<any> Uses suggested fee and target block instead of asking, use any value (1)", default=False)
+    parser.add_argument("--yes", "-y", help="Broadcast the transaction without asking for confirmation", action="store_true")
     parser.add_argument("--peers", help="<'130.61.131.16','207.180.203.132'> Broadcasts transaction only to the supplied list of peers", default=False)
     args = parser.parse_args()
 
@@ -142,4 +145,4 @@ if __name__ == "__main__":
     if not fee:
         fee = 0
 
-    send_transaction(transaction, ips=ips, logger=logger)
+    send_transaction(transaction, ips=ips, logger=logger, confirm=not (args.auto or args.yes))
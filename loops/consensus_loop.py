@@ -84,12 +84,11 @@ class ConsensusClient(threading.Thread):
 
     def add_peers_to_trust_pool(self) -> None:
         for peer in self.memserver.peers.copy():
-            if ip_stored(peer) and self.memserver.ip != peer:
+            if peer not in self.trust_pool.keys() and self.memserver.ip != peer and ip_stored(peer):
                 peer_trust = load_peer(ip=peer,
                                        key="peer_trust",
                                        logger=self.logger)
-                if peer not in self.trust_pool.keys():
-                    self.trust_pool[peer] = peer_trust
+                self.trust_pool[peer] = peer_trust
 
     def purge_block_producers(self) -> None:
         for entry in self.memserver.purge_producers_list:
@@ -3,11 +3,12 @@ import sys
 import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from config import get_timestamp_seconds
 from event_bus import EventBus
 from loops.consensus_loop import change_trust
-from ops.account_ops import increase_produced_count, change_balance, get_totals, index_totals
+from ops.account_ops import reflect_block
 from ops.block_ops import (
     knows_block,
     get_blocks_after,
@@ -23,8 +24,8 @@ from ops.block_ops import (
     valid_block_timestamp
 )
 from ops.data_ops import set_and_sort, shuffle_dict, sort_list_dict, get_byte_size, sort_occurrence, dict_to_val_list
-from ops.peer_ops import load_trust, update_local_address, ip_stored, check_ip, qualifies_to_sync, announce_me
-from ops.pool_ops import merge_buffer, cull_buffer
+from ops.peer_ops import load_trust, update_local_address, load_stored_ips, check_ip, qualifies_to_sync, announce_me
+from ops.pool_ops import merge_buffer, cull_buffer, remove_from_pool
 from ops.transaction_ops import remove_outdated_transactions
 from ops.transaction_ops import (
     to_readable_amount,
@@ -63,6 +64,9 @@ class CoreClient(threading.Thread):
         self.run_interval = 1
         self.event_bus = EventBus()
         self.consecutive = 0
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1)
+        self.loop = asyncio.new_event_loop()
+        """one event loop for the lifetime of the thread instead of one per request"""
 
     def get_period(self):
         """Enter every period at least period_counter times. Iterator is present in case node is stuck in phase 3.
@@ -164,7 +168,7 @@ class CoreClient(threading.Thread):
                                                           block_producers_hash=self.memserver.block_producers_hash,
                                                           logger=self.logger,
                                                           event_bus=self.event_bus,
-                                                          transaction_pool=self.memserver.transaction_pool.copy(),
+                                                          transaction_pool=tuple(self.memserver.transaction_pool),
                                                           latest_block=self.memserver.latest_block,
                                                           block_time=self.memserver.block_time
                                                           )
@@ -221,6 +225,11 @@ class CoreClient(threading.Thread):
                 self.logger.info(f"No hashes to sync from")
 
             else:
+                known_trees = {}
+                """root hash probes do not depend on the hash candidate, so each peer is asked at most once"""
+                unreachable_list = self.memserver.unreachable.keys()
+                median_trust = self.consensus.trust_median
+
                 for hash_candidate in sorted_hashes:
                     """go from the most common hash to the least common one"""
 
@@ -236,16 +245,17 @@ class CoreClient(threading.Thread):
                                 peer_protocol = self.consensus.status_pool[peer]["protocol"]
                                 """get protocol version"""
 
-                                known_block = asyncio.run(knows_block(
-                                    target_peer=peer,
-                                    port=self.memserver.port,
-                                    hash=self.memserver.earliest_block["block_hash"],
-                                    logger=self.logger))
-
-                                if known_block:
-                                    known_tree = True
+                                if value == hash_candidate:
+                                    if peer not in known_trees:
+                                        known_trees[peer] = bool(self.loop.run_until_complete(knows_block(
+                                            target_peer=peer,
+                                            port=self.memserver.port,
+                                            hash=self.memserver.earliest_block["block_hash"],
+                                            logger=self.logger)))
+                                    known_tree = known_trees[peer]
                                 else:
-                                    known_tree = False
+                                    known_tree = None
+                                    """not probed, hash mismatch disqualifies the peer before the tree is checked"""
 
                                 if not first_peer:
                                     if value == hash_candidate:
@@ -257,8 +267,8 @@ class CoreClient(threading.Thread):
                                                                   peer_trust=peer_trust,
                                                                   memserver_protocol=self.memserver.protocol,
                                                                   known_tree=known_tree,
-                                                                  unreachable_list=self.memserver.unreachable.keys(),
-                                                                  median_trust=self.consensus.trust_median,
+                                                                  unreachable_list=unreachable_list,
+                                                                  median_trust=median_trust,
                                                                   peer_hash=value,
                                                                   required_hash=hash_candidate,
                                                                   promiscuous=self.memserver.promiscuous)
@@ -330,9 +340,10 @@ class CoreClient(threading.Thread):
                         fail_storage=self.memserver.purge_peers_list
                     )
 
+                stored_ips = load_stored_ips()
                 replacements = []
                 for block_producer in suggested_block_producers:
-                    if ip_stored(block_producer):
+                    if block_producer in stored_ips:
                         replacements.append(block_producer)
                     elif block_producer not in self.memserver.peer_buffer:
                         self.logger.info(f"{block_producer} not stored locally and will be probed")
@@ -348,7 +359,7 @@ class CoreClient(threading.Thread):
         """replace pool (block, tx, block producers) when out of sync to prevent forking"""
         self.logger.info(f"Replacing {key} from {peer}")
 
-        suggested_pool = asyncio.run(get_from_single_target(
+        suggested_pool = self.loop.run_until_complete(get_from_single_target(
             key=key,
             target_peer=peer,
             logger=self.logger))
@@ -361,6 +372,27 @@ class CoreClient(threading.Thread):
                                                      value=-1)
             self.logger.info(f"Could not replace {key} from {peer}")
 
+    def fetch_blocks_after(self, peer, from_hash):
+        """runs its own event loop for the prefetch thread, the core thread uses self.loop"""
+        return asyncio.run(get_blocks_after(
+            target_peer=peer,
+            from_hash=from_hash,
+            count=50,
+            logger=self.logger
+        ))
+
+    def still_syncing_from(self, peer) -> bool:
+        """checks made before every batch, the same the outer loop makes before the first one"""
+        if not self.memserver.emergency_mode:
+            return False
+        if self.get_peer_to_sync_from(source_pool=self.consensus.block_hash_pool) != peer:
+            return False
+        return bool(self.loop.run_until_complete(knows_block(
+            target_peer=peer,
+            port=self.memserver.port,
+            hash=self.memserver.latest_block["block_hash"],
+            logger=self.logger)))
+
     def emergency_mode(self):
         self.logger.warning("Entering emergency mode")
         try:
@@ -372,7 +404,7 @@ class CoreClient(threading.Thread):
                     time.sleep(1)
                 else:
                     block_hash = self.memserver.latest_block["block_hash"]
-                    known_block = asyncio.run(knows_block(
+                    known_block = self.loop.run_until_complete(knows_block(
                         target_peer=peer,
                         port=self.memserver.port,
                         hash=block_hash,
@@ -384,14 +416,24 @@ class CoreClient(threading.Thread):
                         )
 
                         try:
-                            new_blocks = asyncio.run(get_blocks_after(
+                            new_blocks = self.loop.run_until_complete(get_blocks_after(
                                 target_peer=peer,
                                 from_hash=block_hash,
                                 count=50,
                                 logger=self.logger
                             ))
 
-                            if new_blocks:
+                            if not new_blocks:
+                                self.logger.info(f"No newer blocks found from {peer}")
+                                break
+
+                            while new_blocks:
+                                next_blocks = self.prefetch_executor.submit(self.fetch_blocks_after,
+                                                                            peer=peer,
+                                                                            from_hash=new_blocks[-1]["block_hash"])
+                                """download the following batch while the current one is being incorporated"""
+
+                                uninterrupted = True
                                 for block in new_blocks:
                                     if not self.memserver.terminate:
                                         uninterrupted = self.produce_block(block=block,
@@ -403,9 +445,19 @@ class CoreClient(threading.Thread):
                                     self.consensus.trust_pool = change_trust(trust_pool=self.consensus.trust_pool,
                                                                              peer=peer,
                                                                              value=1)
-                            else:
-                                self.logger.info(f"No newer blocks found from {peer}")
-                                break
+
+                                if not uninterrupted or self.memserver.terminate or \
+                                        self.memserver.latest_block["block_hash"] != new_blocks[-1]["block_hash"]:
+                                    """prefetched batch only continues the chain if the whole batch was applied"""
+                                    next_blocks.cancel()
+                                    break
+
+                                if not self.still_syncing_from(peer):
+                                    """back to the outer loop, which picks and probes a peer again"""
+                                    next_blocks.cancel()
+                                    break
+
+                                new_blocks = next_blocks.result()
 
                         except Exception as e:
                             self.consensus.trust_pool = change_trust(trust_pool=self.consensus.trust_pool,
@@ -452,6 +504,11 @@ class CoreClient(threading.Thread):
         """successful execution mandatory, must not raise a failure"""
         self.logger.warning(f"Producing block")
 
+        reflect_block(block=block,
+                      sorted_transactions=sorted_transactions,
+                      logger=self.logger,
+                      transactions_height=self.memserver.latest_block["block_number"])
+
         index_transactions(block=block,
                            sorted_transactions=sorted_transactions,
                            logger=self.logger,
@@ -461,28 +518,11 @@ class CoreClient(threading.Thread):
                                      logger=self.logger,
                                      parent=self.memserver.latest_block)
 
-        change_balance(address=block["block_creator"],
-                       amount=block["block_reward"],
-                       logger=self.logger
-                       )
-
-        increase_produced_count(address=block["block_creator"],
-                                amount=block["block_reward"],
-                                logger=self.logger
-                                )
-
-        totals = get_totals(block=block)
-        index_totals(produced=totals["produced"],
-                     fees=totals["fees"],
-                     burned=totals["burned"],
-                     block_height=block["block_number"])
-
         save_block(block, self.logger)
         set_latest_block_info(latest_block=block,
                               logger=self.logger)
 
-    def validate_transactions_in_block(self, block, logger, remote_peer, remote):
-        transactions = sort_list_dict(block["block_transactions"])
+    def validate_transactions_in_block(self, block, transactions, logger, remote_peer, remote):
 
         if block["block_number"] > 20000:  # compat
             if not check_target_match(transactions, block["block_number"], logger=logger):
@@ -500,28 +540,30 @@ class CoreClient(threading.Thread):
             raise
 
         else:
-            for transaction in transactions:
-
-                if transaction in self.memserver.transaction_pool:
-                    self.memserver.transaction_pool.remove(transaction)
-
-                if transaction in self.memserver.user_tx_buffer:
-                    self.memserver.user_tx_buffer.remove(transaction)
-
-                if transaction in self.memserver.tx_buffer:
-                    self.memserver.tx_buffer.remove(transaction)
-
-                try:
-                    validate_transaction(transaction=transaction,
-                                         logger=logger,
-                                         block_height=self.memserver.latest_block["block_number"])
-                except Exception as e:
-                    self.logger.error(f"Failed to validate transaction during block preparation: {e}")
-                    if remote:
-                        self.consensus.trust_pool = change_trust(trust_pool=self.consensus.trust_pool,
-                                                                 peer=remote_peer,
-                                                                 value=-1)
-                    raise
+            processed_txids = set()
+            try:
+                for transaction in transactions:
+                    processed_txids.add(transaction["txid"])
+
+                    try:
+                        validate_transaction(transaction=transaction,
+                                             logger=logger,
+                                             block_height=self.memserver.latest_block["block_number"])
+                    except Exception as e:
+                        self.logger.error(f"Failed to validate transaction during block preparation: {e}")
+                        if remote:
+                            self.consensus.trust_pool = change_trust(trust_pool=self.consensus.trust_pool,
+                                                                     peer=remote_peer,
+                                                                     value=-1)
+                        raise
+            finally:
+                """processed transactions leave all pools, rebuilt once per block instead of removed one by one"""
+                self.memserver.transaction_pool = remove_from_pool(self.memserver.transaction_pool,
+                                                                   txids=processed_txids)
+                self.memserver.user_tx_buffer = remove_from_pool(self.memserver.user_tx_buffer,
+                                                                 txids=processed_txids)
+                self.memserver.tx_buffer = remove_from_pool(self.memserver.tx_buffer,
+                                                            txids=processed_txids)
 
     def verify_block(self, block, remote, remote_peer=None, is_old=False):
         """this function has critical checks and must raise a failure/halt if there is one"""
@@ -532,13 +574,15 @@ class CoreClient(threading.Thread):
             if not valid_block_timestamp(new_block=block):
                 raise ValueError(f"Invalid block timestamp {block['block_timestamp']}")
 
+            sorted_transactions = sort_list_dict(block["block_transactions"])
+
             if not is_old or not self.memserver.quick_sync:
                 self.validate_transactions_in_block(block=block,
+                                                    transactions=sorted_transactions,
                                                     logger=self.logger,
                                                     remote_peer=remote_peer,
                                                     remote=remote)
 
-            sorted_transactions = sort_list_dict(block["block_transactions"])
             return sorted_transactions
 
         except Exception as e:
@@ -616,6 +660,7 @@ class CoreClient(threading.Thread):
         self.memserver.penalties = event
 
     def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
         self.init_hashes()
         update_local_address(logger=self.logger)
         self.event_bus.add_listener('penalty-list-update', self.penalty_list_update_handler)
@@ -634,7 +679,8 @@ class CoreClient(threading.Thread):
                 self.duration = get_timestamp_seconds() - start
 
                 # if self.memserver.since_last_block < self.memserver.block_time or self.memserver.force_sync_ip:
-                time.sleep(self.run_interval)
+                self.memserver.core_wake.wait(timeout=self.run_interval)
+                self.memserver.core_wake.clear()
 
             except Exception as e:
                 self.logger.error(f"Error in core loop: {e} {traceback.print_exc()}")
@@ -642,6 +688,8 @@ class CoreClient(threading.Thread):
                 # raise #test
 
         self.event_bus.remove_listener('penalty-list-update', self.penalty_list_update_handler)
+        self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.loop.close()
 
         self.logger.info("Termination code reached, bye")
         sys.exit(0)
@@ -11,7 +11,7 @@ from ops.block_ops import save_block_producers
 from ops.data_ops import set_and_sort
 from ops.peer_ops import announce_me, get_list_of_peers, store_producer_set, load_ips, check_save_peers, \
     dump_trust
-from ops.peer_ops import get_public_ip, update_local_ip, ip_stored, check_ip
+from ops.peer_ops import get_public_ip, update_local_ip, check_ip, load_stored_ips
 
 
 class PeerClient(threading.Thread):
@@ -33,14 +33,21 @@ class PeerClient(threading.Thread):
                                   fails=self.memserver.purge_peers_list,
                                   unreachable=self.memserver.unreachable)
 
+        known_peers = set(self.memserver.peers)
+        known_producers = set(self.memserver.block_producers)
+        stored_ips = load_stored_ips()
+        """sets for membership tests, kept in step with the lists they mirror"""
+
         for entry in result["success"]:
-            if entry not in self.memserver.block_producers and ip_stored(entry):
+            if entry not in known_producers and entry in stored_ips:
                 self.logger.info(f"{entry} loaded remotely and added to block producers")
                 self.memserver.block_producers.append(entry)
+                known_producers.add(entry)
             if entry in self.memserver.peer_buffer:
                 self.memserver.peer_buffer.remove(entry)
-            if entry not in self.memserver.peers and len(self.memserver.peers) < self.memserver.peer_limit:
+            if entry not in known_peers and len(self.memserver.peers) < self.memserver.peer_limit:
                 self.memserver.peers.append(entry)
+                known_peers.add(entry)
 
         self.memserver.block_producers = set_and_sort(self.memserver.block_producers)
         store_producer_set(self.memserver.block_producers)
@@ -59,14 +66,21 @@ class PeerClient(threading.Thread):
                          fails=self.memserver.purge_peers_list,
                          unreachable=self.memserver.unreachable)
 
+        known_peers = set(self.memserver.peers)
+        known_producers = set(self.memserver.block_producers)
+        stored_ips = load_stored_ips()
+        """sets for membership tests, kept in step with the lists they mirror"""
+
         for peer in candidates:
             if check_ip(peer):
                 if peer not in self.memserver.unreachable:
-                    if peer not in self.memserver.peers and len(self.memserver.peers) < self.memserver.peer_limit:
+                    if peer not in known_peers and len(self.memserver.peers) < self.memserver.peer_limit:
                         self.memserver.peers.append(peer)
+                        known_peers.add(peer)
 
-                    if peer not in self.memserver.block_producers and ip_stored(peer):
+                    if peer not in known_producers and peer in stored_ips:
                         self.memserver.block_producers.append(peer)
+                        known_producers.add(peer)
                         self.logger.warning(f"Added {peer} to block producers")
                         """address is sniffed before block is produced"""
 
@@ -78,7 +92,7 @@ class PeerClient(threading.Thread):
         if entry in self.memserver.peers:
             self.memserver.peers.remove(entry)
 
-        if entry not in self.memserver.unreachable.keys():
+        if entry not in self.memserver.unreachable:
             self.memserver.unreachable[entry] = get_timestamp_seconds()
 
     def purge_peers(self) -> None:
@@ -1,5 +1,5 @@
 import asyncio
-from threading import Lock
+from threading import Lock, Event
 
 from compounder import compound_get_list_of
 from config import get_timestamp_seconds, get_config
@@ -13,8 +13,8 @@ from ops.transaction_ops import (
     validate_transaction,
     sort_transaction_pool,
     validate_txid,
-    validate_base_fee
-
+    validate_base_fee,
+    intern_addresses
 )
 from versioner import read_version
 
@@ -58,7 +58,12 @@ class MemServer:
         self.penalties = {}
 
         self.transaction_pool_hash = None
+        self.core_wake = Event()
+        """set when new transactions arrive so the core loop does not wait out its interval"""
         self.block_producers_hash = None
+        self.hash_cache = {"transaction_pool": (None, None),
+                           "block_producers": (None, None)}
+        """fingerprint and hash of the last computed pool hashes, recomputed only when the pools change"""
         self.block_generation_age = 0 # time since last block (real, not target)
         self.reported_uptime = self.get_uptime()
         self.block_producers = load_block_producers()
@@ -91,19 +96,35 @@ class MemServer:
             self.purge_peers_list.append(peer)
 
     def get_transaction_pool_hash(self) -> [str, None]:
-        if self.transaction_pool:
-            sorted_transaction_pool = sort_transaction_pool(self.transaction_pool.copy())
+        transaction_pool = self.transaction_pool.copy()
+        fingerprint = frozenset(transaction["txid"] for transaction in transaction_pool)
+        """txid covers the whole signed content, so an unchanged set of txids means an unchanged hash"""
+
+        cached_fingerprint, cached_hash = self.hash_cache["transaction_pool"]
+        if fingerprint == cached_fingerprint:
+            return cached_hash
+
+        if transaction_pool:
+            sorted_transaction_pool = sort_transaction_pool(transaction_pool)
             transaction_pool_hash = blake2b_hash(sorted_transaction_pool)
         else:
             transaction_pool_hash = None
+
+        self.hash_cache["transaction_pool"] = (fingerprint, transaction_pool_hash)
         return transaction_pool_hash
 
     def get_block_producers_hash(self) -> [str, None]:
+        cached_fingerprint, cached_hash = self.hash_cache["block_producers"]
+        if tuple(self.block_producers) == cached_fingerprint:
+            return cached_hash
+
         if self.block_producers:
             self.block_producers = set_and_sort(self.block_producers)
             producers_pool_hash = blake2b_hash(self.block_producers)
         else:
             producers_pool_hash = None
+
+        self.hash_cache["block_producers"] = (tuple(self.block_producers), producers_pool_hash)
         return producers_pool_hash
 
     def get_uptime(self) -> int:
@@ -142,7 +163,8 @@ class MemServer:
     def merge_transaction(self, transaction, user_origin=False) -> dict:
         """warning, can get stuck if not efficient"""
         united_pools = self.transaction_pool.copy() + self.tx_buffer.copy() + self.user_tx_buffer.copy()
-
+        """pooled transactions by txid, so a resubmission is found without comparing against every entry"""
+        pooled = {pool_tx.get("txid"): pool_tx for pool_tx in united_pools}
 
         if not get_account(transaction["sender"], create_on_error=False):
             msg = {"result": False,
@@ -169,7 +191,7 @@ class MemServer:
                    "message": f"Base fee is too low"}
             return msg
 
-        elif transaction not in united_pools:
+        elif pooled.get(transaction.get("txid")) != transaction:
             try:
                 validate_transaction(transaction=transaction,
                                      logger=self.logger,
@@ -185,12 +207,14 @@ class MemServer:
                     validate_single_spending(transaction_pool=united_pools, transaction=transaction)
 
                     if transaction not in self.transaction_pool:
+                        intern_addresses(transaction)
                         if user_origin and transaction not in self.tx_buffer:
                             self.user_tx_buffer.append(transaction)
                             self.user_tx_buffer = sort_list_dict(self.user_tx_buffer)
                         elif transaction not in self.user_tx_buffer:
                             self.tx_buffer.append(transaction)
                             self.tx_buffer = sort_list_dict(self.tx_buffer)
+                        self.core_wake.set()
 
                 except Exception as e:
                     msg = f"Remote transaction failed to validate: {e}"
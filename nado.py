@@ -4,8 +4,13 @@ import os
 import signal
 import socket
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import msgpack
+import orjson
 import tornado.ioloop
 import tornado.web
 
@@ -18,44 +23,190 @@ from loops.message_loop import MessageClient
 from loops.peer_loop import PeerClient
 from memserver import MemServer
 from ops.account_ops import get_account, fetch_totals
-from ops.block_ops import get_block, fee_over_blocks, get_block_number, get_penalty
+from ops.block_ops import (
+    get_block,
+    fee_over_blocks,
+    get_block_number,
+    get_penalty,
+    get_blocks_before_batch,
+    get_blocks_after_batch
+)
 from ops.data_ops import get_home, allow_async
 from ops.key_ops import keyfile_found, generate_keys, save_keys, load_keys
 from ops.log_ops import get_logger, logging
 from ops.peer_ops import save_peer, get_remote_status, get_producer_set, check_ip
-from ops.transaction_ops import get_transaction, get_transactions_of_account, to_readable_amount
+from ops.transaction_ops import get_transaction, get_transactions_of_account, to_readable_amount, ensure_account_indexes
 
 from pympler import summary, muppy
 
 
 def is_port_in_use(port: int) -> bool:
+    """try to bind the port instead of connecting to it, connecting can stall when nothing listens"""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(("localhost", port)) == 0
+        if sys.platform != "win32":
+            """ignore sockets lingering in TIME_WAIT after a restart, on Windows this would allow stealing the port"""
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(("", port))
+            return False
+        except OSError:
+            return True
 
 
 def handler(signum, frame):
     logger.info(f"Terminating: {signum}: {frame}")
     memserver.terminate = True
+    memserver.core_wake.set()
     sys.exit(0)
 
 
-def serialize(output, name=None, compress=None):
+packer_local = threading.local()
+"""handlers run on worker threads and a Packer is not thread-safe, so each thread gets its own"""
+
+
+def get_packer() -> msgpack.Packer:
+    packer = getattr(packer_local, "packer", None)
+    if not packer:
+        packer = msgpack.Packer(use_bin_type=True, autoreset=True)
+        packer_local.packer = packer
+    return packer
+
+
+def serialize(output, name=None, compress=None) -> bytes:
     if compress == "msgpack":
-        output = msgpack.packb(output)
+        return get_packer().pack(output)
     elif not isinstance(output, dict) and name:
         output = {name: output}
-    return output
+    elif isinstance(output, str):
+        """plain text goes out as it is"""
+        return output.encode()
+
+    try:
+        return orjson.dumps(output, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        """orjson refuses integers wider than 64 bits"""
+        return json.dumps(output).encode()
+
+
+def write_serialized(handler, output, name=None, compress=None):
+    if compress != "msgpack" and not (isinstance(output, str) and not name):
+        handler.set_header("Content-Type", "application/json; charset=UTF-8")
+    handler.write(serialize(output=output, name=name, compress=compress))
+
+
+serialized_cache = {}
+"""encoded responses of read-only endpoints by name and compression"""
+
+
+def serialize_cached(output, name=None, compress=None, version=None, ttl=1) -> bytes:
+    """reuse the encoded output while version is unchanged, at most for ttl seconds
+    because in-place mutations of the source do not change its version"""
+    key = (name, compress == "msgpack")
+    """anything but msgpack encodes the same, so each endpoint keeps at most two entries whatever clients send"""
+    cached = serialized_cache.get(key)
+
+    if cached and cached["version"] == version and cached["expires"] > time.monotonic():
+        return cached["encoded"]
+
+    encoded = serialize(output=output, name=name, compress=compress)
+
+    serialized_cache[key] = {"version": version,
+                             "encoded": encoded,
+                             "expires": time.monotonic() + ttl}
+    return encoded
+
+
+def write_cached(handler, output, name, compress, version):
+    if compress != "msgpack":
+        handler.set_header("Content-Type", "application/json; charset=UTF-8")
+    handler.write(serialize_cached(output=output,
+                                   name=name,
+                                   compress=compress,
+                                   version=version))
+
+
+def get_version(*sources) -> tuple:
+    """cheap fingerprint of collections which are mostly replaced rather than mutated"""
+    return tuple((id(source), len(source)) for source in sources)
+
+
+health_cache = {"health": None, "expires": 0}
+health_executor = ThreadPoolExecutor(max_workers=1)
+"""a single worker makes concurrent health requests wait for one scan instead of each running their own"""
+
+
+def get_health(ttl=10):
+    """walking all live objects is expensive, so the summary is reused for ttl seconds"""
+    if health_cache["expires"] < time.monotonic():
+        health_cache["health"] = summary.summarize(muppy.get_objects())
+        health_cache["expires"] = time.monotonic() + ttl
+    return health_cache["health"]
+
+
+read_cache = {"block_hash": None,
+              "transactions": OrderedDict(),
+              "blocks": OrderedDict(),
+              "accounts": OrderedDict(),
+              "supply": OrderedDict()}
+read_cache_lock = threading.Lock()
+
+
+def cached_read(kind, key, read, limit=4096):
+    """drive reads reused until the latest block changes, which also covers rollbacks"""
+    with read_cache_lock:
+        if read_cache["block_hash"] != memserver.latest_block["block_hash"]:
+            read_cache["block_hash"] = memserver.latest_block["block_hash"]
+            for cache in ("transactions", "blocks", "accounts", "supply"):
+                read_cache[cache].clear()
+
+        block_hash = read_cache["block_hash"]
+        cache = read_cache[kind]
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    value = read(key)
+
+    if value:
+        """misses are not stored, the entry may appear with the next block"""
+        with read_cache_lock:
+            if read_cache["block_hash"] == block_hash == memserver.latest_block["block_hash"]:
+                """a read that overlapped a block change may hold the old state and is not kept"""
+                cache[key] = value
+                if len(cache) > limit:
+                    cache.popitem(last=False)
+    return value
+
+
+class PollHandler(tornado.web.RequestHandler):
+    """endpoints polled by peers and explorers, HEAD returns the headers of GET without the body"""
+
+    def head(self, *args):
+        return self.get(*args)
 
 
 class HomeHandler(tornado.web.RequestHandler):
+    rendered = {}
+    """homepage bytes by node ip, the ip is the only input of the template"""
+
     def home(self):
-        self.render("templates/homepage.html", ip=get_config()["ip"])
+        ip = get_config()["ip"]
+        if ip not in HomeHandler.rendered:
+            HomeHandler.rendered = {ip: self.render_string("templates/homepage.html", ip=ip)}
+        self.write(HomeHandler.rendered[ip])
 
     def get(self):
         self.home()
 
 
-class StatusHandler(tornado.web.RequestHandler):
+class CachedStaticFileHandler(tornado.web.StaticFileHandler):
+    """static assets only change with a new release, let browsers keep them for a day"""
+
+    def get_cache_time(self, path, modified, mime_type):
+        return 86400
+
+
+class StatusHandler(PollHandler):
     def status(self):
         compress = StatusHandler.get_argument(self, "compress", default="none")
 
@@ -71,140 +222,152 @@ class StatusHandler(tornado.web.RequestHandler):
                 "version": memserver.version,
             }
 
-            self.write(serialize(name="status",
-                                 output=status_dict,
-                                 compress=compress))
+            write_serialized(self,
+                             name="status",
+                             output=status_dict,
+                             compress=compress)
 
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.status)
+    def get(self):
+        self.status()
 
 
-class TransactionPoolHandler(tornado.web.RequestHandler):
+class TransactionPoolHandler(PollHandler):
     def transaction_pool(self):
         compress = TransactionPoolHandler.get_argument(self, "compress", default="none")
         transaction_pool_data = memserver.transaction_pool
-        self.write(serialize(name="transaction_pool",
-                             output=transaction_pool_data,
-                             compress=compress))
+        write_cached(self,
+                     name="transaction_pool",
+                     output=transaction_pool_data,
+                     compress=compress,
+                     version=get_version(transaction_pool_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.transaction_pool)
+    def get(self):
+        self.transaction_pool()
 
 
-class TransactionBufferHandler(tornado.web.RequestHandler):
+class TransactionBufferHandler(PollHandler):
     def transaction_buffer(self):
         compress = TransactionBufferHandler.get_argument(self, "compress", default="none")
         buffer_data = memserver.tx_buffer
 
-        self.write(serialize(name="transaction_buffer",
-                             output=buffer_data,
-                             compress=compress))
+        write_cached(self,
+                     name="transaction_buffer",
+                     output=buffer_data,
+                     compress=compress,
+                     version=get_version(buffer_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.transaction_buffer)
+    def get(self):
+        self.transaction_buffer()
 
 
-class UserTxBufferHandler(tornado.web.RequestHandler):
+class UserTxBufferHandler(PollHandler):
     def transaction_buffer(self):
         compress = UserTxBufferHandler.get_argument(self, "compress", default="none")
         buffer_data = memserver.user_tx_buffer
 
-        self.write(serialize(name="user_transaction_buffer",
-                             output=buffer_data,
-                             compress=compress))
+        write_cached(self,
+                     name="user_transaction_buffer",
+                     output=buffer_data,
+                     compress=compress,
+                     version=get_version(buffer_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.transaction_buffer)
+    def get(self):
+        self.transaction_buffer()
 
 
-class TrustPoolHandler(tornado.web.RequestHandler):
+class TrustPoolHandler(PollHandler):
     def trust_pool(self):
         compress = TrustPoolHandler.get_argument(self, "compress", default="none")
         trust_pool_data = consensus.trust_pool
 
-        self.write(serialize(name="trust_pool_data",
-                             output=trust_pool_data,
-                             compress=compress,
-                             ))
+        write_cached(self,
+                     name="trust_pool_data",
+                     output=trust_pool_data,
+                     compress=compress,
+                     version=get_version(trust_pool_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.trust_pool)
+    def get(self):
+        self.trust_pool()
 
 
-class PeerPoolHandler(tornado.web.RequestHandler):
+class PeerPoolHandler(PollHandler):
     def peer_pool(self):
         compress = PeerPoolHandler.get_argument(self, "compress", default="none")
-        peers_data = list(memserver.peers)
+        peers_data = memserver.peers
 
-        self.write(serialize(name="peers",
-                             output=peers_data,
-                             compress=compress
-                             ))
+        write_cached(self,
+                     name="peers",
+                     output=peers_data,
+                     compress=compress,
+                     version=get_version(peers_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.peer_pool)
+    def get(self):
+        self.peer_pool()
 
-class PeerBufferHandler(tornado.web.RequestHandler):
+class PeerBufferHandler(PollHandler):
     def peer_buffer(self):
         compress = PeerBufferHandler.get_argument(self, "compress", default="none")
-        peers_data = list(memserver.peer_buffer)
+        peers_data = memserver.peer_buffer
 
-        self.write(serialize(name="peer_buffer",
-                             output=peers_data,
-                             compress=compress
-                             ))
+        write_cached(self,
+                     name="peer_buffer",
+                     output=peers_data,
+                     compress=compress,
+                     version=get_version(peers_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.peer_buffer)
-class PenaltiesHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.peer_buffer()
+class PenaltiesHandler(PollHandler):
     def penalties(self):
         compress = PenaltiesHandler.get_argument(self, "compress", default="none")
         output = {
             "penalties": memserver.penalties
         }
 
-        self.write(serialize(name="penalties",
-                             output=output,
-                             compress=compress
-                             ))
+        write_serialized(self,
+                         name="penalties",
+                         output=output,
+                         compress=compress)
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.penalties)
+    def get(self):
+        self.penalties()
 
 
 
-class UnreachableHandler(tornado.web.RequestHandler):
+class UnreachableHandler(PollHandler):
     def unreachable(self):
         compress = PeerPoolHandler.get_argument(self, "compress", default="none")
         unreachable_data = memserver.unreachable
 
-        self.write(serialize(name="unreachable",
-                             output=unreachable_data,
-                             compress=compress
-                             ))
+        write_serialized(self,
+                         name="unreachable",
+                         output=unreachable_data,
+                         compress=compress)
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.unreachable)
+    def get(self):
+        self.unreachable()
 
 
-class BlockProducerPoolHandler(tornado.web.RequestHandler):
+class BlockProducerPoolHandler(PollHandler):
     def block_producers(self):
         compress = BlockProducerPoolHandler.get_argument(self, "compress", default="none")
-        producer_data = list(memserver.block_producers)
+        producer_data = memserver.block_producers
 
-        self.write(serialize(name="block_producers",
-                             output=producer_data,
-                             compress=compress))
+        write_cached(self,
+                     name="block_producers",
+                     output=producer_data,
+                     compress=compress,
+                     version=get_version(producer_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.block_producers)
+    def get(self):
+        self.block_producers()
 
 
-class BlockProducersHashPoolHandler(tornado.web.RequestHandler):
+class BlockProducersHashPoolHandler(PollHandler):
     def block_producers_hash_pool(self):
         compress = BlockProducersHashPoolHandler.get_argument(self, "compress", default="none")
 
@@ -213,15 +376,18 @@ class BlockProducersHashPoolHandler(tornado.web.RequestHandler):
             "majority_block_producers_hash_pool": consensus.majority_block_producers_hash,
         }
 
-        self.write(serialize(name="block_producers_hash_pool",
-                             output=output,
-                             compress=compress))
+        write_cached(self,
+                     name="block_producers_hash_pool",
+                     output=output,
+                     compress=compress,
+                     version=get_version(consensus.block_producers_hash_pool) + (
+                         consensus.majority_block_producers_hash,))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.block_producers_hash_pool)
+    def get(self):
+        self.block_producers_hash_pool()
 
 
-class TransactionHashPoolHandler(tornado.web.RequestHandler):
+class TransactionHashPoolHandler(PollHandler):
     def transaction_hash_pool(self):
         compress = TransactionHashPoolHandler.get_argument(self, "compress", default="none")
 
@@ -230,15 +396,18 @@ class TransactionHashPoolHandler(tornado.web.RequestHandler):
             "majority_transactions_hash_pool": consensus.majority_transaction_pool_hash,
         }
 
-        self.write(serialize(name="transactions_hash_pool",
-                             output=output,
-                             compress=compress))
+        write_cached(self,
+                     name="transactions_hash_pool",
+                     output=output,
+                     compress=compress,
+                     version=get_version(consensus.transaction_hash_pool) + (
+                         consensus.majority_transaction_pool_hash,))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.transaction_hash_pool)
+    def get(self):
+        self.transaction_hash_pool()
 
 
-class BlockHashPoolHandler(tornado.web.RequestHandler):
+class BlockHashPoolHandler(PollHandler):
     def block_hash_pool(self):
         compress = BlockHashPoolHandler.get_argument(self, "compress", default="none")
 
@@ -247,43 +416,57 @@ class BlockHashPoolHandler(tornado.web.RequestHandler):
             "majority_block_opinion": consensus.majority_block_hash,
         }
 
-        self.write(serialize(name="block_hash_pool",
-                             output=output,
-                             compress=compress))
+        write_cached(self,
+                     name="block_hash_pool",
+                     output=output,
+                     compress=compress,
+                     version=get_version(consensus.block_hash_pool) + (
+                         consensus.majority_block_hash,))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.block_hash_pool)
+    def get(self):
+        self.block_hash_pool()
 
 
-class FeeHandler(tornado.web.RequestHandler):
+class FeeHandler(PollHandler):
     def fee(self):
-        self.write({"fee": fee_over_blocks(logger=logger) + 1})
+        write_serialized(self, output={"fee": fee_over_blocks(logger=logger) + 1})
 
     async def get(self):
         await asyncio.to_thread(self.fee)
 
 
-class StatusPoolHandler(tornado.web.RequestHandler):
+class StatusPoolHandler(PollHandler):
     def status_pool(self):
         compress = StatusPoolHandler.get_argument(self, "compress", default="none")
         status_pool_data = consensus.status_pool
 
-        self.write(serialize(name="status_pool",
-                             output=status_pool_data,
-                             compress=compress))
+        write_cached(self,
+                     name="status_pool",
+                     output=status_pool_data,
+                     compress=compress,
+                     version=get_version(status_pool_data))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.status_pool)
+    def get(self):
+        self.status_pool()
 
 
 class SubmitTransactionHandler(tornado.web.RequestHandler):
+    max_transaction_size = 16384
+    """bytes of encoded transaction accepted, checked before parsing"""
+
     def submit_transaction(self):
         try:
-            transaction_raw = SubmitTransactionHandler.get_argument(self, "data")
-            transaction = json.loads(transaction_raw)
+            transaction_raw = SubmitTransactionHandler.get_argument(self, "data").encode()
+
+            if len(transaction_raw) > self.max_transaction_size:
+                self.set_status(413)
+                self.write(f"Error: Transaction larger than {self.max_transaction_size} bytes")
+                return
+
+            transaction = orjson.loads(transaction_raw)
 
             output = memserver.merge_transaction(transaction, user_origin=True)
-            self.write(output)
+            write_serialized(self, output=output)
 
             if not output["result"]:
                 self.set_status(403)
@@ -292,42 +475,41 @@ class SubmitTransactionHandler(tornado.web.RequestHandler):
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.submit_transaction)
 
 
 class HealthHandler(tornado.web.RequestHandler):
-    def health(self):
-        compress = LogHandler.get_argument(self, "compress", default="none")
-        health = summary.summarize(muppy.get_objects())
+    async def get(self):
+        compress = HealthHandler.get_argument(self, "compress", default="none")
+        health = await asyncio.get_running_loop().run_in_executor(health_executor, get_health)
 
-        if compress == "msgpack":
-            output = msgpack.packb(health)
-        else:
-            output = serialize(name="health",
-                                 output=health,
-                                 compress=compress)
-        self.write(output)
+        write_serialized(self,
+                         name="health",
+                         output=health,
+                         compress=compress)
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.health)
 
 class LogHandler(tornado.web.RequestHandler):
     def log(self):
-        compress = LogHandler.get_argument(self, "compress", default="none")
-
+        """msgpack variant, all lines are packed as one list in a single write"""
         with open(f"{get_home()}/logs/log.log") as logfile:
-            lines = logfile.readlines()
-            for line in lines:
-                if compress == "msgpack":
-                    output = msgpack.packb(line)
-                else:
-                    output = line
-                self.write(output)
-                self.write("<br>")
+            self.write(get_packer().pack(logfile.readlines()))
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.log)
+    async def stream_log(self):
+        """send the log in chunks as it is read instead of holding it in memory"""
+        with open(f"{get_home()}/logs/log.log", "rb") as logfile:
+            while chunk := logfile.read(65536):
+                self.write(chunk.replace(b"\n", b"\n<br>"))
+                await self.flush()
+
+    async def get(self):
+        compress = LogHandler.get_argument(self, "compress", default="none")
+
+        if compress == "msgpack":
+            await asyncio.to_thread(self.log)
+        else:
+            await self.stream_log()
 
 
 class ForceSyncHandler(tornado.web.RequestHandler):
@@ -351,7 +533,7 @@ class ForceSyncHandler(tornado.web.RequestHandler):
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.force_sync)
 
 
@@ -361,13 +543,13 @@ class IpHandler(tornado.web.RequestHandler):
         client_ip = self.request.remote_ip
 
         if compress == "msgpack":
-            output = msgpack.packb(client_ip)
+            output = get_packer().pack(client_ip)
         else:
             output = client_ip
         self.write(output)
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.log)
+    def get(self):
+        self.log()
 
 
 class TerminateHandler(tornado.web.RequestHandler):
@@ -386,7 +568,7 @@ class TerminateHandler(tornado.web.RequestHandler):
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.terminate)
 
 
@@ -394,22 +576,24 @@ class TransactionHandler(tornado.web.RequestHandler):
     def transaction(self):
         try:
             transaction = TransactionHandler.get_argument(self, "txid")
-            transaction_data = get_transaction(transaction, logger=logger)
+            transaction_data = cached_read("transactions", transaction,
+                                           read=lambda txid: get_transaction(txid, logger=logger))
             compress = TransactionHandler.get_argument(self, "compress", default="none")
 
             if not transaction_data:
                 transaction_data = "Not found"
                 self.set_status(403)
 
-            self.write(serialize(name="txid",
-                                 output=transaction_data,
-                                 compress=compress))
+            write_serialized(self,
+                             name="txid",
+                             output=transaction_data,
+                             compress=compress)
 
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.transaction)
 
 
@@ -430,49 +614,44 @@ class AccountTransactionsHandler(tornado.web.RequestHandler):
                 transaction_data = "Not found"
                 self.set_status(403)
 
-            self.write(serialize(name="account_transactions",
-                                 output=transaction_data,
-                                 compress=compress))
+            write_serialized(self,
+                             name="account_transactions",
+                             output=transaction_data,
+                             compress=compress)
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.account_transactions)
 
 
 class GetBlockHandler(tornado.web.RequestHandler):
     def block(self):
-        output = ""
-
         try:
             block = GetBlockHandler.get_argument(self, "hash")
             compress = GetBlockHandler.get_argument(self, "compress", default="none")
-            block_data = get_block(block)
+            block_data = cached_read("blocks", block, read=get_block)
 
             if not block_data:
                 self.set_status(404)
                 block_data = "Not found"
 
-            output = serialize(name="block_hash",
-                               output=block_data,
-                               compress=compress)
+            write_serialized(self,
+                             name="block_hash",
+                             output=block_data,
+                             compress=compress)
 
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-        finally:
-            self.write(output)
-
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.block)
 
 
 class GetBlockNumberHandler(tornado.web.RequestHandler):
     def block(self):
-        output = ""
-
         try:
             number = GetBlockHandler.get_argument(self, "number")
             compress = GetBlockHandler.get_argument(self, "compress", default="none")
@@ -482,18 +661,16 @@ class GetBlockNumberHandler(tornado.web.RequestHandler):
                 self.set_status(403)
                 block_data = "Not found"
 
-            output = serialize(name="block_number",
-                               output=block_data,
-                               compress=compress)
+            write_serialized(self,
+                             name="block_number",
+                             output=block_data,
+                             compress=compress)
 
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-        finally:
-            self.write(output)
-
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.block)
 
 
@@ -509,21 +686,10 @@ class GetBlocksBeforeHandler(tornado.web.RequestHandler):
             count = 100
 
         try:
-            parent = get_block(block_hash)
-            if parent:
-                parent_hash=["parent_hash"]
-
-                for blocks in range(0, count):
-                    block = get_block(parent_hash)
-                    if not block:
-                        break
-
-                    elif block:
-                        collected_blocks.append(block)
-                        parent_hash = block["parent_hash"]
+            collected_blocks = get_blocks_before_batch(block_hash, count)
 
-                collected_blocks.reverse()
-            else:
+            if collected_blocks is None:
+                collected_blocks = []
                 logger.debug(f"Parent hash of {block_hash} not found")
                 self.set_status(404)
 
@@ -531,16 +697,13 @@ class GetBlocksBeforeHandler(tornado.web.RequestHandler):
             self.set_status(403)
             logger.debug(f"Block collection hit a roadblock: {e}")
 
-            if not collected_blocks:
-                self.set_status(403)
-
         finally:
-            self.write(serialize(name="blocks_before",
-                                 output=collected_blocks,
-                                 compress=compress
-                                 ))
+            write_serialized(self,
+                             name="blocks_before",
+                             output=collected_blocks,
+                             compress=compress)
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.blocks_before)
 
 
@@ -556,47 +719,42 @@ class GetBlocksAfterHandler(tornado.web.RequestHandler):
             count = 100
 
         try:
-            child = get_block(block_hash)
-            if child:
-                child_hash = child["child_hash"]
-
-                for blocks in range(0, count):
-                    block = get_block(child_hash)
-                    if not block:
-                        break
-
-                    elif block:
-                        collected_blocks.append(block)
-                        child_hash = block["child_hash"]
-            else:
+            collected_blocks = get_blocks_after_batch(block_hash, count)
+
+            if collected_blocks is None:
+                collected_blocks = []
                 logger.debug(f"Child hash of {block_hash} not found")
                 self.set_status(404)
 
         except Exception as e:
             logger.debug(f"Block collection hit a roadblock: {e}")
-
-            if not collected_blocks:
-                self.set_status(403)
+            self.set_status(403)
 
         finally:
-            self.write(serialize(name="blocks_after",
-                                 output=collected_blocks,
-                                 compress=compress,
-                                 ))
+            write_serialized(self,
+                             name="blocks_after",
+                             output=collected_blocks,
+                             compress=compress)
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.blocks_after)
 
-class GetSupplyHandler(tornado.web.RequestHandler):
+
+def read_supply(block_number) -> dict:
+    data = fetch_totals()
+    genesis_acc = get_account(address="ndo18c3afa286439e7ebcb284710dbd4ae42bdaf21b80137b")
+    data.update({"block_number": block_number})
+    data.update({"reserve": genesis_acc["balance"]})
+    data.update({"reserve_spent": 1000000000000000000 - genesis_acc["balance"]})
+    data.update({"circulating": data["reserve_spent"] + data["produced"] - data["burned"] - data["fees"]})
+    data.update({"total_supply": 1000000000000000000 + data["produced"] - data["burned"] - data["fees"]})
+    return data
+
+
+class GetSupplyHandler(PollHandler):
     def get_supply(self):
         readable = GetSupplyHandler.get_argument(self, "readable", default="none")
-        data = fetch_totals()
-        genesis_acc = get_account(address="ndo18c3afa286439e7ebcb284710dbd4ae42bdaf21b80137b")
-        data.update({"block_number": memserver.latest_block["block_number"]})
-        data.update({"reserve": genesis_acc["balance"]})
-        data.update({"reserve_spent": 1000000000000000000 - genesis_acc["balance"]})
-        data.update({"circulating": data["reserve_spent"] + data["produced"] - data["burned"] - data["fees"]})
-        data.update({"total_supply": 1000000000000000000 + data["produced"] - data["burned"] - data["fees"]})
+        data = cached_read("supply", memserver.latest_block["block_number"], read=read_supply).copy()
 
         if readable == "true":
             data.update({"produced": to_readable_amount(data["produced"])})
@@ -607,22 +765,25 @@ class GetSupplyHandler(tornado.web.RequestHandler):
             data.update({"circulating": to_readable_amount(data["circulating"])})
             data.update({"total_supply": to_readable_amount(data["total_supply"])})
 
-        self.write(data)
-    async def get(self, parameter):
+        write_serialized(self, output=data)
+
+    async def get(self):
         await asyncio.to_thread(self.get_supply)
 
 
-class GetLatestBlockHandler(tornado.web.RequestHandler):
+class GetLatestBlockHandler(PollHandler):
     def latest_block(self):
         latest_block_data = memserver.latest_block
         compress = GetLatestBlockHandler.get_argument(self, "compress", default="none")
 
-        self.write(serialize(name="latest_block",
-                             output=latest_block_data,
-                             compress=compress))
+        write_cached(self,
+                     name="latest_block",
+                     output=latest_block_data,
+                     compress=compress,
+                     version=latest_block_data["block_hash"])
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.latest_block)
+    def get(self):
+        self.latest_block()
 
 
 class AccountHandler(tornado.web.RequestHandler):
@@ -631,9 +792,11 @@ class AccountHandler(tornado.web.RequestHandler):
             account = AccountHandler.get_argument(self, "address", default=memserver.address)
             compress = AccountHandler.get_argument(self, "compress", default="none")
             readable = AccountHandler.get_argument(self, "readable", default="none")
-            account_data = get_account(account, create_on_error=False)
+            account_data = cached_read("accounts", account,
+                                       read=lambda address: get_account(address, create_on_error=False))
 
             if account_data:
+                account_data = account_data.copy()
                 account_data.update({"penalty": get_penalty(producer_address=account,
                                        block_hash=memserver.latest_block["block_hash"],
                                        block_number=memserver.latest_block["block_number"])})
@@ -647,15 +810,16 @@ class AccountHandler(tornado.web.RequestHandler):
                 account_data = "Not found"
                 self.set_status(403)
 
-            self.write(serialize(name="address",
-                                 output=account_data,
-                                 compress=compress))
+            write_serialized(self,
+                             name="address",
+                             output=account_data,
+                             compress=compress)
 
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.account)
 
 
@@ -671,27 +835,28 @@ class ProducerSetHandler(tornado.web.RequestHandler):
                 producer_data = "Not found"
                 self.set_status(403)
 
-            self.write(serialize(name="producer_set",
-                                 output=producer_data,
-                                 compress=compress))
+            write_serialized(self,
+                             name="producer_set",
+                             output=producer_data,
+                             compress=compress)
         except Exception as e:
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
+    async def get(self):
         await asyncio.to_thread(self.producer_set)
 
 
 class AnnouncePeerHandler(tornado.web.RequestHandler):
-    def announce(self):
+    async def announce(self):
         try:
             peer_ip = AnnouncePeerHandler.get_argument(self, "ip")
             if not check_ip(peer_ip):
                 self.write("Invalid IP address")
 
             else:
-                if peer_ip not in memserver.peers and peer_ip not in memserver.unreachable.keys():
-                    status = asyncio.run(get_remote_status(peer_ip, logger=logger))
+                if peer_ip not in memserver.peers and peer_ip not in memserver.unreachable:
+                    status = await get_remote_status(peer_ip, logger=logger)
 
                     assert status, f"{peer_ip} unreachable"
 
@@ -699,13 +864,14 @@ class AnnouncePeerHandler(tornado.web.RequestHandler):
                     protocol = status["protocol"]
 
                     assert address, "No address detected"
-                    assert protocol >= get_config()["protocol"], f"Protocol of {peer_ip} is too low"
+                    assert protocol >= CONFIG["protocol"], f"Protocol of {peer_ip} is too low"
 
-                    save_peer(ip=peer_ip,
-                              address=address,
-                              port=get_config()["port"],
-                              overwrite=True
-                              )
+                    await asyncio.to_thread(save_peer,
+                                            ip=peer_ip,
+                                            address=address,
+                                            port=CONFIG["port"],
+                                            overwrite=True
+                                            )
 
                     if peer_ip not in memserver.peer_buffer:
                         memserver.peer_buffer.append(peer_ip)
@@ -721,52 +887,52 @@ class AnnouncePeerHandler(tornado.web.RequestHandler):
             self.set_status(403)
             self.write(f"Error: {e}")
 
-    async def get(self, parameter):
-        await asyncio.to_thread(self.announce)
+    async def get(self):
+        await self.announce()
 
 
 async def make_app(port):
     application = tornado.web.Application(
         [
+            (r"/status/?", StatusHandler),
+            (r"/get_latest_block/?", GetLatestBlockHandler),
+            (r"/transaction_pool/?", TransactionPoolHandler),
+            (r"/transaction_buffer/?", TransactionBufferHandler),
+            (r"/peers/?", PeerPoolHandler),
+            (r"/block_producers/?", BlockProducerPoolHandler),
+            (r"/get_blocks_after/?", GetBlocksAfterHandler),
+            (r"/submit_transaction/?", SubmitTransactionHandler),
+            (r"/announce_peer/?", AnnouncePeerHandler),
+            (r"/get_recommended_fee/?", FeeHandler),
             (r"/", HomeHandler),
-            (r"/get_transactions_of_account(.*)", AccountTransactionsHandler),
-            (r"/get_transaction(.*)", TransactionHandler),
-            (r"/get_blocks_after(.*)", GetBlocksAfterHandler),
-            (r"/get_blocks_before(.*)", GetBlocksBeforeHandler),
-            (r"/get_block_number(.*)", GetBlockNumberHandler),
-            (r"/get_block(.*)", GetBlockHandler),
-            (r"/get_account(.*)", AccountHandler),
-            (r"/get_producer_set_from_hash(.*)", ProducerSetHandler),
-            (r"/transaction_pool(.*)", TransactionPoolHandler),
-            (r"/transaction_hash_pool(.*)", TransactionHashPoolHandler),
-            (r"/transaction_buffer(.*)", TransactionBufferHandler),
-            (r"/user_transaction_buffer(.*)", UserTxBufferHandler),
-            (r"/trust_pool(.*)", TrustPoolHandler),
-            (r"/get_latest_block(.*)", GetLatestBlockHandler),
-            (r"/get_supply(.*)", GetSupplyHandler),
-            (r"/announce_peer(.*)", AnnouncePeerHandler),
-            (r"/status_pool(.*)", StatusPoolHandler),
-            (r"/status(.*)", StatusHandler),
-            (r"/peers(.*)", PeerPoolHandler),
-            (r"/peer_buffer(.*)", PeerBufferHandler),
-            (r"/penalties(.*)", PenaltiesHandler),
-            (r"/unreachable(.*)", UnreachableHandler),
-            (r"/block_producers_hash_pool(.*)", BlockProducersHashPoolHandler),
-            (r"/block_producers(.*)", BlockProducerPoolHandler),
-            (r"/block_hash_pool(.*)", BlockHashPoolHandler),
-            (r"/get_recommended_fee", FeeHandler),
-            (r"/terminate(.*)", TerminateHandler),
-            (r"/health(.*)", HealthHandler),
-            (r"/submit_transaction(.*)", SubmitTransactionHandler),
-            (r"/log(.*)", LogHandler),
-            (r"/whats_my_ip(.*)", IpHandler),
-            (r"/force_sync(.*)", ForceSyncHandler),
-            (r"/static/(.*)", tornado.web.StaticFileHandler, {"path": "static"}),
-            (r'/(favicon.ico)', tornado.web.StaticFileHandler, {"path": "graphics"}),
+            (r"/get_transactions_of_account/?", AccountTransactionsHandler),
+            (r"/get_transaction/?", TransactionHandler),
+            (r"/get_blocks_before/?", GetBlocksBeforeHandler),
+            (r"/get_block_number/?", GetBlockNumberHandler),
+            (r"/get_block/?", GetBlockHandler),
+            (r"/get_account/?", AccountHandler),
+            (r"/get_producer_set_from_hash/?", ProducerSetHandler),
+            (r"/transaction_hash_pool/?", TransactionHashPoolHandler),
+            (r"/user_transaction_buffer/?", UserTxBufferHandler),
+            (r"/trust_pool/?", TrustPoolHandler),
+            (r"/get_supply/?", GetSupplyHandler),
+            (r"/status_pool/?", StatusPoolHandler),
+            (r"/peer_buffer/?", PeerBufferHandler),
+            (r"/penalties/?", PenaltiesHandler),
+            (r"/unreachable/?", UnreachableHandler),
+            (r"/block_producers_hash_pool/?", BlockProducersHashPoolHandler),
+            (r"/block_hash_pool/?", BlockHashPoolHandler),
+            (r"/terminate/?", TerminateHandler),
+            (r"/health/?", HealthHandler),
+            (r"/log/?", LogHandler),
+            (r"/whats_my_ip/?", IpHandler),
+            (r"/force_sync/?", ForceSyncHandler),
+            (r"/static/(.*)", CachedStaticFileHandler, {"path": "static"}),
+            (r'/(favicon.ico)', CachedStaticFileHandler, {"path": "graphics"}),
 
         ]
     )
-    application.listen(port)
+    application.listen(port, idle_connection_timeout=120, max_body_size=65536)
     await asyncio.Event().wait()
 
 """warning, no intensive operations or locks should be invoked from API interface"""
@@ -797,10 +963,15 @@ if not keyfile_found():
               port=get_config()["port"],
               peer_trust=10000)
 
+ensure_account_indexes(logger=logger)
+
+CONFIG = get_config()
+"""port and protocol do not change while the node runs, the ip may and is read through get_config"""
+
 info_path = os.path.normpath(f'{get_home()}/private/keys.dat')
 logger.info(f"Key location: {info_path}")
 
-assert not is_port_in_use(get_config()["port"]), "Port already in use, exiting"
+assert not is_port_in_use(CONFIG["port"]), "Port already in use, exiting"
 signal.signal(signal.SIGINT, handler)
 signal.signal(signal.SIGTERM, handler)
 
@@ -826,4 +997,4 @@ messages.start()
 
 logger.info("Starting Request Handler")
 
-asyncio.run(make_app(get_config()["port"]))
+asyncio.run(make_app(CONFIG["port"]))
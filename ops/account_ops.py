@@ -1,14 +1,24 @@
+import threading
 import time
 
 from .data_ops import get_home
 from .sqlite_ops import DbHandler
 
+account_reader = threading.local()
+
+
+def get_account_reader() -> DbHandler:
+    """account lookups reuse one connection per thread instead of opening the database every time"""
+    reader = getattr(account_reader, "handler", None)
+    if reader is None:
+        reader = DbHandler(db_file=f"{get_home()}/index/accounts.db")
+        account_reader.handler = reader
+    return reader
+
 
 def get_account(address, create_on_error=True):
     """return all account information if account exists else create it"""
-    acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
-    fetched = acc_handler.db_fetch("SELECT * FROM acc_index WHERE address = ?", (address,))
-    acc_handler.close()
+    fetched = get_account_reader().db_fetch("SELECT * FROM acc_index WHERE address = ?", (address,))
 
     if fetched:
         account = {"address": fetched[0][0],
@@ -22,55 +32,105 @@ def get_account(address, create_on_error=True):
         return None
 
 
-def reflect_transaction(transaction, logger, block_height, revert=False):
+def get_accounts(addresses, create_on_error=True, batch_size=500) -> dict:
+    """return accounts of many addresses by address, read through one connection in batches"""
+    addresses = list(set(addresses))
+    accounts = {}
 
-    if block_height > 111111:
-        sender = transaction["sender"]
-        recipient = transaction["recipient"]
+    acc_handler = get_account_reader()
+    for start in range(0, len(addresses), batch_size):
+        batch = addresses[start:start + batch_size]
+        fetched = acc_handler.db_fetch(
+            f"SELECT * FROM acc_index WHERE address IN ({','.join('?' * len(batch))})", batch)
 
-        amount_sender = transaction["amount"]+transaction["fee"]
-        amount_recipient = transaction["amount"]
+        for row in fetched or []:
+            accounts[row[0]] = {"address": row[0],
+                                "balance": row[1],
+                                "produced": row[2],
+                                "burned": row[3]}
 
-    else:
+    if create_on_error:
+        for address in addresses:
+            if address not in accounts:
+                accounts[address] = create_account(address)
+
+    return accounts
+
+
+def get_balance_changes(transactions, block_height, revert=False) -> dict:
+    """sums balance and burn changes of all transactions per address"""
+    changes = {}
+
+    for transaction in transactions:
         sender = transaction["sender"]
         recipient = transaction["recipient"]
 
-        amount_sender = transaction["amount"]
+        if block_height > 111111:
+            amount_sender = transaction["amount"] + transaction["fee"]
+        else:
+            amount_sender = transaction["amount"]
         amount_recipient = transaction["amount"]
 
-    is_burn = False
-    if recipient == "burn":
-        is_burn = True
+        sender_change = changes.setdefault(sender, {"balance": 0, "burned": 0})
+        sender_change["balance"] -= amount_sender
+        if recipient == "burn":
+            sender_change["burned"] += amount_sender
+
+        recipient_change = changes.setdefault(recipient, {"balance": 0, "burned": 0})
+        recipient_change["balance"] += amount_recipient
+
+    if revert:
+        for change in changes.values():
+            change["balance"] = -change["balance"]
+            change["burned"] = -change["burned"]
 
-    change_balance(address=sender, amount=-amount_sender, is_burn=is_burn, logger=logger, revert=revert)
-    change_balance(address=recipient, amount=amount_recipient, is_burn=False, logger=logger, revert=revert)
+    return changes
 
 
-def change_balance(address: str, amount: int, logger, is_burn=False, revert=False):
+def reflect_block(block, sorted_transactions, logger, transactions_height, revert=False):
+    """apply transactions, reward, produced count and totals of a block to the account index in one commit"""
+    creator = block["block_creator"]
+    reward = -block["block_reward"] if revert else block["block_reward"]
+
+    changes = get_balance_changes(transactions=sorted_transactions, block_height=transactions_height, revert=revert)
+    changes.setdefault(creator, {"balance": 0, "burned": 0})["balance"] += reward
+
+    totals = get_totals(block=block, revert=revert)
+    totals_updates = []
+    if totals["produced"] > 0:
+        totals_updates.append(("UPDATE totals_index SET produced = produced + ?", [(totals["produced"],)]))
+    if totals["fees"] > 0 and block["block_number"] > 111111:
+        totals_updates.append(("UPDATE totals_index SET fees = fees + ?", [(totals["fees"],)]))
+    if totals["burned"] > 0:
+        totals_updates.append(("UPDATE totals_index SET burned = burned + ?", [(totals["burned"],)]))
+
     while True:
         try:
-            if revert:
-                amount = -amount
+            updates = []
+            accounts = get_accounts(changes.keys())
+            for address, change in changes.items():
+                acc = accounts[address]
+
+                new_balance = acc["balance"] + change["balance"]
+                assert (new_balance >= 0), f"Cannot change balance of {address} into negative: {new_balance}"
 
-            acc = get_account(address)
-            new_balance = acc["balance"] + amount
-            assert (new_balance >= 0), f"Cannot change balance into negative: {new_balance}"
+                new_burned = acc["burned"] + change["burned"]
+                assert (new_burned >= 0), f"Cannot change burn of {address} into negative: {new_burned}"
 
-            if is_burn:
-                new_burned = acc["burned"] - amount
-                assert (new_burned >= 0), f"Cannot change burn into negative: {new_burned}"
-            else:
-                new_burned = acc["burned"]
+                updates.append((new_balance, new_burned, address))
+
+            statements = [("UPDATE acc_index SET balance = ?, burned = ? WHERE address = ?", updates),
+                          ("UPDATE acc_index SET produced = produced + ? WHERE address = ?", [(reward, creator)])]
 
             acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
-            acc_handler.db_execute("UPDATE acc_index SET balance = ?, burned = ? WHERE address = ?", (new_balance,
-                                                                                                      new_burned,
-                                                                                                      address,))
+            committed = acc_handler.db_execute_batch(statements + totals_updates)
             acc_handler.close()
+
+            assert committed, "Account index was not updated"
             return True
 
         except Exception as e:
-            logger.error(f"Failed setting balance for {address}: {e}, is_burn: {is_burn}, revert: {revert}")
+            logger.error(f"Failed reflecting block {block['block_hash']}: {e}, revert: {revert}")
             time.sleep(1)
 
 
@@ -95,21 +155,12 @@ def get_totals(block, revert=False):
                 "burned": -burned
                 }
     return result
-def index_totals(produced, fees, burned, block_height):
-    acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
-
-    if produced > 0:
-        acc_handler.db_execute("UPDATE totals_index SET produced = produced + ?", (produced,))
-    if fees > 0 and block_height > 111111:
-        acc_handler.db_execute("UPDATE totals_index SET fees = fees + ?", (fees,))
-    if burned > 0:
-        acc_handler.db_execute("UPDATE totals_index SET burned = burned + ?", (burned,))
-    acc_handler.close()
-
 def fetch_totals():
 
     acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
     totals = acc_handler.db_fetch("SELECT * FROM totals_index")
+    acc_handler.close()
+
     result = {
         "produced": totals[0][0],
          "fees": totals[0][1],
@@ -118,28 +169,6 @@ def fetch_totals():
 
     return result
 
-def increase_produced_count(address, amount, logger, revert=False):
-    while True:
-        try:
-            account = get_account(address)
-            produced = account["produced"]
-            if revert:
-                produced_updated = produced - amount
-                account.update(produced=produced_updated)
-            else:
-                produced_updated = produced + amount
-                account.update(produced=produced_updated)
-
-            acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
-            acc_handler.db_execute("UPDATE acc_index SET produced = ? WHERE address = ?", (produced_updated, address,))
-            acc_handler.close()
-
-            return produced_updated
-
-        except Exception as e:
-            logger.error(f"Failed to validate spending during block production: {e}")
-
-
 def create_account(address, balance=0, burned=0, produced=0):
     acc_handler = DbHandler(db_file=f"{get_home()}/index/accounts.db")
     acc_handler.db_execute("INSERT INTO acc_index VALUES (?,?,?,?)", (address, balance, burned, produced,))
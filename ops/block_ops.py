@@ -4,6 +4,7 @@ import os
 import time
 
 import msgpack
+import orjson
 import requests
 from tornado.httpclient import AsyncHTTPClient
 import aiohttp
@@ -100,7 +101,7 @@ def get_block_candidate(
 
     block_number = latest_block["block_number"] + 1
 
-    targeted_transactions = match_transactions_target(transaction_list=transaction_pool.copy(),
+    targeted_transactions = match_transactions_target(transaction_list=transaction_pool,
                                                       block_number=block_number,
                                                       logger=logger)
 
@@ -159,16 +160,125 @@ def get_block(block):
         return False
 
 
-def get_block_number(number):
+def get_block_hash(number):
     try:
         block_handler = DbHandler(db_file=f"{get_home()}/index/blocks.db")
         fetched = block_handler.db_fetch("SELECT block_hash FROM block_index WHERE block_number = ?", (number,))[0][0]
         block_handler.close()
-        return get_block(fetched)
+        return fetched
     except Exception as e:
         return False
 
 
+def get_block_number(number):
+    block_hash = get_block_hash(number)
+    if block_hash:
+        return get_block(block_hash)
+    else:
+        return False
+
+
+def find_block_transactions(block_hash, txids) -> dict:
+    """stream through a stored block and decode only its transactions up to the last one wanted"""
+    found = {}
+    block_path = f"{get_home()}/blocks/{block_hash}.block"
+    if not txids or not os.path.exists(block_path):
+        return found
+
+    with open(block_path, "rb") as infile:
+        unpacker = msgpack.Unpacker(infile)
+
+        for field in range(unpacker.read_map_header()):
+            if unpacker.unpack() != "block_transactions":
+                unpacker.skip()
+                continue
+
+            for position in range(unpacker.read_array_header()):
+                transaction = unpacker.unpack()
+                if transaction["txid"] in txids:
+                    found[transaction["txid"]] = transaction
+                    if len(found) == len(txids):
+                        break
+            return found
+    return found
+
+
+def find_block_transaction(block_hash, txid):
+    return find_block_transactions(block_hash, {txid}).get(txid)
+
+
+def get_indexed_hashes(block_hash, first, last):
+    """hashes of indexed blocks numbered from first to last relative to block_hash, read in one query"""
+    try:
+        block_handler = DbHandler(db_file=f"{get_home()}/index/blocks.db")
+        fetched = block_handler.db_fetch("SELECT block_number FROM block_index WHERE block_hash = ?", (block_hash,))
+
+        if fetched:
+            number = fetched[0][0]
+            fetched = block_handler.db_fetch(
+                "SELECT block_hash FROM block_index WHERE block_number BETWEEN ? AND ? ORDER BY block_number",
+                (number + first, number + last))
+            hashes = [row[0] for row in fetched]
+        else:
+            hashes = None
+
+        block_handler.close()
+        return hashes
+    except Exception as e:
+        return None
+
+
+def collect_blocks(hashes) -> list:
+    """load blocks in the given order until one is missing"""
+    collected_blocks = []
+    for block_hash in hashes:
+        block = get_block(block_hash)
+        if not block:
+            break
+        collected_blocks.append(block)
+    return collected_blocks
+
+
+def walk_blocks(block, link, count) -> list:
+    """follow parent or child links one block at a time, for blocks missing from the index"""
+    collected_blocks = []
+    for blocks in range(0, count):
+        block = get_block(block[link])
+        if not block:
+            break
+        collected_blocks.append(block)
+    return collected_blocks
+
+
+def get_blocks_before_batch(block_hash, count):
+    """up to count blocks preceding block_hash ordered from the oldest, None if block_hash is unknown"""
+    hashes = get_indexed_hashes(block_hash, first=-count, last=-1)
+
+    if hashes is not None:
+        collected_blocks = collect_blocks(reversed(hashes))
+    else:
+        block = get_block(block_hash)
+        if not block:
+            return None
+        collected_blocks = walk_blocks(block, link="parent_hash", count=count)
+
+    collected_blocks.reverse()
+    return collected_blocks
+
+
+def get_blocks_after_batch(block_hash, count):
+    """up to count blocks following block_hash ordered from the oldest, None if block_hash is unknown"""
+    hashes = get_indexed_hashes(block_hash, first=1, last=count)
+
+    if hashes is not None:
+        return collect_blocks(hashes)
+    else:
+        block = get_block(block_hash)
+        if not block:
+            return None
+        return walk_blocks(block, link="child_hash", count=count)
+
+
 def get_block_producers_hash_demo():
     """use for demo only"""
     config = get_config()
@@ -397,8 +507,8 @@ async def get_blocks_after(target_peer, from_hash, logger, count=50, compress="m
                     read = response.read()
                     return msgpack.unpackb(await read)
                 elif code == 200:
-                    text = response.text()
-                    return json.loads(await text)["blocks_after"]
+                    read = response.read()
+                    return orjson.loads(await read)["blocks_after"]
                 else:
                     return False
 
@@ -418,8 +528,8 @@ async def get_blocks_before(target_peer, from_hash, count=50, compress="true"):
                     read = response.read()
                     return msgpack.unpackb(await read)
                 elif code == 200:
-                    text = response.text()
-                    return json.loads(await text)["blocks_before"]
+                    read = response.read()
+                    return orjson.loads(await read)["blocks_before"]
                 else:
                     return False
 
@@ -436,11 +546,11 @@ async def get_from_single_target(key, target_peer, logger) -> list:  # todo add
 
         async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
             async with session.get(url_construct) as response:
-                text = response.text()
+                read = response.read()
                 code = response.status
 
                 if code == 200:
-                    return json.loads(await text)[key]
+                    return orjson.loads(await read)[key]
                 else:
                     return []
 
@@ -43,9 +43,19 @@ def average(list_of_values) -> int:
 
 
 def sort_list_dict(entries) -> list:
+    """removes duplicates and keeps order, entries are compared by equality only against those in the same bucket,
+    dicts are bucketed by txid and other entries such as ips by themselves"""
+    buckets = {}
     clean_list = []
     for entry in entries:
-        if entry not in clean_list:
+        try:
+            bucket = buckets.setdefault(entry.get("txid") if isinstance(entry, dict) else entry, [])
+        except TypeError:
+            """unhashable key, equal entries still land together as they share the same bucket"""
+            bucket = buckets.setdefault(None, [])
+
+        if entry not in bucket:
+            bucket.append(entry)
             clean_list.append(entry)
     return clean_list
 
@@ -66,6 +76,13 @@ def shuffle_dict(dictionary) -> dict:
 def allow_async():
     if sys.platform == "win32" and (3, 11, 0) >= sys.version_info >= (3, 8, 0):
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    elif sys.platform != "win32":
+        """libuv based loop for the API server and all compounder requests, the default loop if not installed"""
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
 
 
 def make_folder(folder_name: str, strict: bool = True):
@@ -1,6 +1,8 @@
+import atexit
 import logging
 import os.path
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 import coloredlogs
 
@@ -20,7 +22,6 @@ def get_logger(max_detail=False, file="log.log"):
         f"{get_home()}/logs/{file}", maxBytes=3000000, backupCount=10, mode="a"
     )
     file_handler.setFormatter(logging.Formatter(format))
-    logger.addHandler(file_handler)
 
     if max_detail:
         coloredlogs.install(level="DEBUG")
@@ -39,6 +40,19 @@ def get_logger(max_detail=False, file="log.log"):
 )
 
     coloredlogs.install(level="DEBUG", logger=logger, fmt=format)
+
+    """callers only enqueue records, a listener thread does the console and file writes"""
+    writers = [file_handler]
+    for handler in logger.handlers.copy():
+        logger.removeHandler(handler)
+        if not isinstance(handler, QueueHandler):
+            writers.append(handler)
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, *writers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
     return logger
 
 
@@ -6,13 +6,15 @@ import json
 import os
 import os.path
 import statistics
+
+import orjson
 from tornado.httpclient import AsyncHTTPClient
 
 from compounder import compound_get_list_of, compound_announce_self
 from compounder import compound_get_status_pool
 from config import get_port, get_config, get_timestamp_seconds, update_config
 from .data_ops import set_and_sort, get_home
-from hashing import base64encode, blake2b_hash
+from hashing import base64encode, base64decode, blake2b_hash
 from .key_ops import load_keys
 
 import aiohttp
@@ -48,11 +50,11 @@ async def get_remote_status(target_peer, logger) -> [dict, bool]:  # todo add ms
         
         async with aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total=5)) as session:
             async with session.get(url_construct) as response:
-                text = response.text()
+                read = response.read()
                 code = response.status
 
                 if code == 200:
-                    return json.loads(await text)
+                    return orjson.loads(await read)
                 else:
                     return False
 
@@ -61,10 +63,18 @@ async def get_remote_status(target_peer, logger) -> [dict, bool]:  # todo add ms
         return False
 
 
+def forget_peer(ip, listed=False):
+    """drop cached copies after writing a peer, timestamps alone may not change within one tick"""
+    peer_cache.pop(ip, None)
+    if listed:
+        stored_ips_cache["mtime"] = None
+
+
 def delete_peer(ip, logger):
     peer_path = f"{get_home()}/peers/{base64encode(ip)}.dat"
     if os.path.exists(peer_path):
         os.remove(peer_path)
+        forget_peer(ip, listed=True)
         logger.warning(f"Deleted peer {ip}")
 
 
@@ -80,6 +90,7 @@ def save_peer(ip, port, address, peer_trust=50, overwrite=False):
 
         with open(peer_path, "w") as outfile:
             json.dump(peers_message, outfile)
+        forget_peer(ip, listed=True)
 
 
 def ip_stored(ip) -> bool:
@@ -90,6 +101,30 @@ def ip_stored(ip) -> bool:
         return False
 
 
+stored_ips_cache = {"mtime": None, "ips": set()}
+"""peer folder listing, reread only when the folder modification time changes"""
+
+
+def load_stored_ips() -> set:
+    """return ips of all peers stored on drive, set equivalent of ip_stored for many lookups"""
+    peers_path = f"{get_home()}/peers"
+    mtime = os.stat(peers_path).st_mtime_ns
+
+    if mtime != stored_ips_cache["mtime"]:
+        ips = set()
+        for entry in os.scandir(peers_path):
+            if entry.name.endswith(".dat"):
+                try:
+                    ips.add(base64decode(entry.name[:-4]))
+                except Exception:
+                    pass
+
+        stored_ips_cache["ips"] = ips
+        stored_ips_cache["mtime"] = mtime
+
+    return stored_ips_cache["ips"]
+
+
 def dump_trust(pool_data, logger):
     for key, value in pool_data.items():
         update_peer(ip=key,
@@ -172,17 +207,28 @@ def load_trust(peer, logger):
                      logger=logger)
 
 
+peer_cache = {}
+"""parsed peer files by ip, reused until the file changes on drive"""
+
+
 def load_peer(logger, ip, key=None) -> [str, dict]:
         try:
             peer_file = f"{get_home()}/peers/{base64encode(ip)}.dat"
+            stat = os.stat(peer_file)
+            file_version = (stat.st_mtime_ns, stat.st_size)
+
+            cached = peer_cache.get(ip)
+            if cached and cached[0] == file_version:
+                peer_dict = cached[1]
+            else:
+                with open(peer_file, "r") as infile:
+                    peer_dict = json.load(infile)
+                peer_cache[ip] = (file_version, peer_dict)
+
             if not key:
-                with open(peer_file, "r") as peer_file:
-                    peer_dict = json.load(peer_file)
-                return peer_dict
+                return peer_dict.copy()
             else:
-                with open(peer_file, "r") as peer_file:
-                    peer_key = json.load(peer_file)[key]
-                return peer_key
+                return peer_dict[key]
         except Exception as e:
             logger.info(f"Failed to load peer {ip} from drive: {e}")
 
@@ -199,6 +245,7 @@ def update_peer(ip, value, logger, key="peer_trust") -> None:
 
             with open(peer_file, "w") as outfile:
                 json.dump(peer, outfile)
+            forget_peer(ip)
         except Exception as e:
             logger.info(f"Failed to update peer file of {ip}: {e}")
 
@@ -375,6 +422,10 @@ def update_local_ip(ip, logger):
 
 def qualifies_to_sync(peer, peer_trust, peer_protocol, known_tree, memserver_protocol, median_trust,
                       unreachable_list, peer_hash, required_hash, promiscuous) -> dict:
+    if not peer_hash == required_hash:
+        """hash of the peer not in the currently cascaded one"""
+        return {"result": False,
+                "flag": "Peer hash not in majority"}
     if not known_tree:
         """we don't know peer's root hash"""
         return {"result": False,
@@ -392,10 +443,6 @@ def qualifies_to_sync(peer, peer_trust, peer_protocol, known_tree, memserver_pro
         """peer protocol too low"""
         return {"result": False,
                 "flag": "Peer protocol too low"}
-    if not peer_hash == required_hash:
-        """hash of the peer not in the currently cascaded one"""
-        return {"result": False,
-                "flag": "Peer hash not in majority"}
 
     return {"result": True}
 
@@ -23,6 +23,11 @@ def merge_buffer(from_buffer, to_buffer, block_max, block_min) -> dict:
             "to_buffer": to_buffer}
 
 
+def remove_from_pool(pool, txids) -> list:
+    """drop transactions whose txid is in the given set, one pass instead of a list.remove per transaction"""
+    return [transaction for transaction in pool if transaction["txid"] not in txids]
+
+
 def get_from_pool(pool, source, target):
     for item in pool.copy().items():
         target[item[0]] = item[1][source]
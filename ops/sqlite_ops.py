@@ -26,6 +26,18 @@ class DbHandler:
             print(e, query, *args)
             return False
 
+    def db_execute_batch(self, statements):
+        """runs every (query, rows) pair through executemany and commits them together"""
+        try:
+            with self.con:
+                for query, rows in statements:
+                    self.cur.executemany(query, rows)
+                self.con.commit()
+            return True
+        except Exception as e:
+            print(e, statements)
+            return False
+
     def db_fetch(self, query, *args):
         try:
             with self.con:
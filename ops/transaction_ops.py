@@ -1,17 +1,23 @@
 import asyncio
 import json
 import os.path
+import sys
 import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from operator import itemgetter
+from threading import Lock
 
 import msgpack
+import orjson
 from tornado.httpclient import AsyncHTTPClient
 
 from Curve25519 import sign, verify, unhex
-from ops.account_ops import get_account, reflect_transaction
+from ops.account_ops import get_account, get_accounts
 from ops.address_ops import proof_sender
 from ops.address_ops import validate_address
-from ops.block_ops import get_block_number
-from compounder import compound_send_transaction
+from ops.block_ops import get_block_hash, find_block_transaction, find_block_transactions
+from compounder import compound_send_transaction, make_session
 from config import get_config
 from config import get_timestamp_seconds
 from ops.data_ops import sort_list_dict, get_home, get_byte_size
@@ -21,32 +27,38 @@ from ops.log_ops import get_logger
 from ops.peer_ops import load_ips
 from ops.sqlite_ops import DbHandler
 import aiohttp
-import glob
 
 
 def round_to(from_number, to_number):
     return round(from_number / to_number) * to_number
 
 
-async def get_recommneded_fee(target, port, base_fee, logger):
+def open_session(session=None):
+    """reuse a session passed in and leave it open, otherwise open one for this request only"""
+    if session:
+        return nullcontext(session)
+    return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+
+
+async def get_recommneded_fee(target, port, base_fee, logger, session=None):
     try:
         url_construct = f"http://{target}:{port}/get_recommended_fee"
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        async with open_session(session) as session:
             async with session.get(url_construct) as response:
-                result = json.loads(await response.text())
+                result = orjson.loads(await response.read())
                 return result['fee'] + base_fee
     except Exception as e:
         logger.warning(f"Failed to get recommended fee: {e}")
 
 
-async def get_target_block(target, port, logger):
+async def get_target_block(target, port, logger, session=None):
     try:
         url_construct = f"http://{target}:{port}/get_latest_block"
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        async with open_session(session) as session:
             async with session.get(url_construct) as response:
-                result = json.loads(await response.text())
+                result = orjson.loads(await response.read())
                 return result['block_number'] + 2
     except Exception as e:
         logger.warning(f"Failed to get target block: {e}")
@@ -61,22 +73,33 @@ def remove_outdated_transactions(transaction_list, block_number):
     return cleaned
 
 
+def get_tx_index_files(newest_first=True) -> list:
+    """block range databases of the transaction index ordered by their range"""
+    tx_dir = f"{get_home()}/index/transactions"
+    ranges = []
+    for entry in os.scandir(tx_dir):
+        if entry.name.startswith("block_range_") and entry.name.endswith(".db"):
+            ranges.append((int(entry.name[len("block_range_"):-len(".db")]), entry.path))
+    return [path for height, path in sorted(ranges, reverse=newest_first)]
+
+
 def get_transaction(txid, logger):
     """return transaction based on txid"""
 
     try:
-        tx_dir = f"{get_home()}/index/transactions/*db"
-        for br_file in glob.glob(tx_dir):
+        for br_file in get_tx_index_files():
 
             tx_handler = DbHandler(db_file=br_file)
-            block_number = tx_handler.db_fetch("SELECT block_number FROM tx_index WHERE txid = ?", (txid,))[0][0]
+            fetched = tx_handler.db_fetch("SELECT block_number FROM tx_index WHERE txid = ?", (txid,))
             tx_handler.close()
 
-            block = get_block_number(number=block_number)
+            if not fetched:
+                """not in this block range, try the next one"""
+                continue
 
-            for transaction in block["block_transactions"]:
-                if transaction["txid"] == txid:
-                    return transaction
+            transaction = find_block_transaction(block_hash=get_block_hash(fetched[0][0]), txid=txid)
+            if transaction:
+                return transaction
 
     except Exception as e:
         return None
@@ -86,6 +109,21 @@ def create_txid(transaction):
     return blake2b_hash(json.dumps(transaction))
 
 
+def strip_fields(transaction: dict, *fields) -> dict:
+    """copy of transaction without fields in one pass, raises KeyError like pop if any is missing"""
+    for field in fields:
+        if field not in transaction:
+            raise KeyError(field)
+    return {key: value for key, value in transaction.items() if key not in fields}
+
+
+def intern_addresses(transaction: dict) -> dict:
+    """pooled transactions of the same account share one string object per address and public key"""
+    for field in ("sender", "recipient", "public_key"):
+        transaction[field] = sys.intern(transaction[field])
+    return transaction
+
+
 def validate_transaction(transaction, logger, block_height):
     assert isinstance(transaction, dict), "Data structure incomplete"
     assert validate_origin(transaction, block_height=block_height), "Invalid origin"
@@ -99,39 +137,58 @@ def validate_transaction(transaction, logger, block_height):
 
 def min_from_transaction_pool(transactions: list, key="fee") -> dict:
     """returns dictionary from a list of dictionaries with minimum value"""
-    return min(sort_list_dict(transactions), key=lambda transaction: transaction[key])
+    return min(transactions, key=itemgetter(key))
 
 
 def max_from_transaction_pool(transactions: list, key="fee") -> dict:
     """returns dictionary from a list of dictionaries with maximum value"""
-    return max(sort_list_dict(transactions), key=lambda transaction: transaction[key])
+    return max(transactions, key=itemgetter(key))
 
 
 def sort_transaction_pool(transactions: list, key="txid") -> list:
-    """sorts list of dictionaries based on a dictionary value"""
-    return sorted(
-        sort_list_dict(transactions), key=lambda transaction: transaction[key]
-    )
+    """sorts list of dictionaries based on a dictionary value, duplicates are dropped"""
+    return sorted(sort_list_dict(transactions), key=itemgetter(key))
+
+
+def ensure_account_index(br_file) -> bool:
+    """index sender and recipient so account lookups do not scan the whole block range"""
+    tx_handler = DbHandler(db_file=br_file)
+    indexed = tx_handler.db_execute("CREATE INDEX IF NOT EXISTS sender_index ON tx_index(sender, block_number)") \
+        and tx_handler.db_execute("CREATE INDEX IF NOT EXISTS recipient_index ON tx_index(recipient, block_number)")
+    tx_handler.close()
+    return indexed
+
+
+def ensure_account_indexes(logger):
+    """run at startup before other threads write, ranges from older versions get their account indexes here"""
+    for br_file in get_tx_index_files(newest_first=False):
+        if not ensure_account_index(br_file):
+            logger.error(f"Failed to create account indexes for {br_file}")
 
 
 def get_transactions_of_account(account, min_block: int, logger):
     all_txs = []
-    tx_dir = f"{get_home()}/index/transactions/*db"
-    for br_file in glob.glob(tx_dir):
-
+    for br_file in get_tx_index_files(newest_first=False):
         acc_handler = DbHandler(db_file=br_file)
 
         fetched = acc_handler.db_fetch(
-            "SELECT txid FROM tx_index WHERE (sender = ? OR recipient = ?) AND block_number >= ? ORDER BY block_number LIMIT 1000",
+            "SELECT txid, block_number FROM tx_index WHERE (sender = ? OR recipient = ?) AND block_number >= ? ORDER BY block_number LIMIT 1000",
             (account, account, min_block))
 
         acc_handler.close()
 
-        tx_list = []
-        for txid in fetched:
-            tx_list.append(get_transaction(logger=logger,
-                                           txid=txid[0]))
-        all_txs.extend(tx_list)
+        """txids grouped by block, so every block is read once however many of them it holds"""
+        by_block = {}
+        for txid, block_number in fetched or []:
+            by_block.setdefault(block_number, []).append(txid)
+
+        for block_number, txids in by_block.items():
+            try:
+                found = find_block_transactions(block_hash=get_block_hash(block_number), txids=set(txids))
+            except Exception as e:
+                logger.error(f"Failed to read transactions of block {block_number}: {e}")
+                found = {}
+            all_txs.extend(found.get(txid) for txid in txids)
 
     return {"transactions": all_txs}
 
@@ -144,21 +201,19 @@ def to_raw_amount(amount: [int, float]) -> int:
     return int(float(amount) * 10000000000)
 
 
-def check_balance(account, amount, fee):
-    """for single transaction, check if the fee and the amount spend are allowable"""
-    balance = get_account(account)["balance"]
+def check_balance(account, amount, fee, balance=None):
+    """for single transaction, check if the fee and the amount spend are allowable, balance is read if not known"""
+    if balance is None:
+        balance = get_account(account)["balance"]
     assert (
-            balance - amount - fee > 0 <= amount
+            balance - amount - fee > 0 and amount >= 0
     ), f"{account} spending more than owned in a single transaction"
     return True
 
 
 def get_senders(transaction_pool: list) -> list:
-    sender_pool = []
-    for transaction in transaction_pool:
-        if transaction["sender"] not in sender_pool:
-            sender_pool.append(transaction["sender"])
-    return sender_pool
+    """unique senders in order of their first transaction"""
+    return list(dict.fromkeys(transaction["sender"] for transaction in transaction_pool))
 
 
 def validate_single_spending(transaction_pool: list, transaction):
@@ -177,6 +232,7 @@ def validate_single_spending(transaction_pool: list, transaction):
                 account=sender,
                 amount=pool_tx["amount"],
                 fee=pool_tx["fee"],
+                balance=standing_balance,
             )
 
             amount_sum += pool_tx["amount"]
@@ -189,35 +245,49 @@ def validate_single_spending(transaction_pool: list, transaction):
 
 def validate_all_spending(transaction_pool: list):
     """validate spending of all spenders in a transaction pool against their transactions"""
-    sender_pool = get_senders(transaction_pool)
-
-    for sender in sender_pool:
-        standing_balance = get_account(sender)["balance"]
-        amount_sum = 0
-        fee_sum = 0
-
-        for pool_tx in transaction_pool:
-            if pool_tx["sender"] == sender:
-                check_balance(
-                    account=sender,
-                    amount=pool_tx["amount"],
-                    fee=pool_tx["fee"],
-                )
-
-                amount_sum += pool_tx["amount"]
-                fee_sum += pool_tx["fee"]
-
-                spending = amount_sum + fee_sum
-                assert spending <= standing_balance, "Overspending attempt"
+    accounts = get_accounts(get_senders(transaction_pool))
+    spending = {}
+    """one pass over the pool, spending is summed per sender as it goes"""
+
+    for pool_tx in transaction_pool:
+        sender = pool_tx["sender"]
+        standing_balance = accounts[sender]["balance"]
+
+        check_balance(
+            account=sender,
+            amount=pool_tx["amount"],
+            fee=pool_tx["fee"],
+            balance=standing_balance,
+        )
+
+        spending[sender] = spending.get(sender, 0) + pool_tx["amount"] + pool_tx["fee"]
+        assert spending[sender] <= standing_balance, "Overspending attempt"
     return True
 
 
+verified_origins = OrderedDict()
+verified_origins_lock = Lock()
+
+
+def remember_origin(origin: tuple, limit=100000):
+    with verified_origins_lock:
+        verified_origins[origin] = True
+        if len(verified_origins) > limit:
+            verified_origins.popitem(last=False)
+
+
 def validate_origin(transaction: dict, block_height):
     """save signature and then remove it as it is not a part of the signed message"""
 
-    transaction = transaction.copy()
     signature = transaction["signature"]
-    del transaction["signature"]
+
+    if block_height >= 102000:
+        """only txid is signed, so a transaction seen in the pool is not verified again when its block arrives"""
+        origin = (signature, transaction["sender"], transaction["public_key"], transaction["txid"])
+        if origin in verified_origins:
+            return True
+
+    transaction = strip_fields(transaction, "signature")
 
     assert proof_sender(
         sender=transaction["sender"],
@@ -236,14 +306,14 @@ def validate_origin(transaction: dict, block_height):
             message=unhex(transaction["txid"]),
             public_key=transaction["public_key"],
         ), "Invalid sender"
+        remember_origin(origin)
 
     return True
 
 
 def get_base_fee(transaction):
     try:
-        tx_copy = transaction.copy()
-        base_fee = get_byte_size(tx_copy)
+        base_fee = get_byte_size(transaction)
         return base_fee
 
     except Exception as e:
@@ -253,11 +323,8 @@ def get_base_fee(transaction):
 
 def validate_base_fee(transaction, logger):
     try:
-        tx_copy = transaction.copy()
-        fee = tx_copy["fee"]
-        tx_copy.pop("fee")
-        tx_copy.pop("signature")
-        tx_copy.pop("txid")
+        fee = transaction["fee"]
+        tx_copy = strip_fields(transaction, "fee", "signature", "txid")
 
         if fee >= get_base_fee(tx_copy):
             return True
@@ -271,10 +338,8 @@ def validate_base_fee(transaction, logger):
 
 def validate_txid(transaction, logger):
     try:
-        tx_copy = transaction.copy()
-        txid_to_check = tx_copy["txid"]
-        tx_copy.pop("txid")
-        tx_copy.pop("signature")
+        txid_to_check = transaction["txid"]
+        tx_copy = strip_fields(transaction, "txid", "signature")
         txid_genuine = create_txid(tx_copy)
         if txid_genuine == txid_to_check:
             return True
@@ -319,26 +384,33 @@ def draft_transaction(sender, recipient, amount, public_key, timestamp, data, ta
     return transaction_message
 
 
+def open_tx_index(db_path) -> DbHandler:
+    """the index can be rebuilt from blocks, so it is written through a WAL without syncing every commit"""
+    tx_handler = DbHandler(db_file=db_path)
+    tx_handler.db_execute("PRAGMA journal_mode=WAL")
+    tx_handler.db_execute("PRAGMA synchronous=NORMAL")
+    return tx_handler
+
+
 def unindex_transactions(block, logger, block_height):
+    txids_to_unindex = [(transaction["txid"],) for transaction in block["block_transactions"]]
+    if not txids_to_unindex:
+        return
+
+    height_db = round_to(block_height, 10000)
+    db_path = f"{get_home()}/index/transactions/block_range_{height_db}.db"
+
     while True:
         try:
-            txids_to_unindex = []
-            for transaction in block["block_transactions"]:
-                txids_to_unindex.append([transaction["txid"]])
-                reflect_transaction(transaction=transaction,
-                                    revert=True,
-                                    logger=logger,
-                                    block_height=block_height)
-
-            if txids_to_unindex:
-                height_db = round_to(block_height, 10000)
-                tx_handler = DbHandler(db_file=f"{get_home()}/index/transactions/block_range_{height_db}.db")
-                tx_handler.db_executemany("DELETE FROM tx_index WHERE txid = ?", txids_to_unindex)
-                tx_handler.close()
+            tx_handler = open_tx_index(db_path)
+            unindexed = tx_handler.db_executemany("DELETE FROM tx_index WHERE txid = ?", txids_to_unindex)
+            tx_handler.close()
+            assert unindexed, f"Transaction index {db_path} was not updated"
             break
 
         except Exception as e:
             logger.error(f"Failed to unindex transactions: {e}")
+            time.sleep(1)
 
 
 def index_transactions(block, sorted_transactions, logger, block_height):
@@ -352,22 +424,21 @@ def index_transactions(block, sorted_transactions, logger, block_height):
         tx_handler.db_execute(query="CREATE INDEX seek_index ON tx_index(txid, sender, recipient)")
         tx_handler.close()
 
+        while not ensure_account_index(db_path):
+            logger.error(f"Failed to create account indexes for {db_path}")
+            time.sleep(1)
+
+    txs_to_index = [(transaction['txid'],
+                     block['block_number'],
+                     transaction['sender'],
+                     transaction['recipient']) for transaction in sorted_transactions]
+
     while True:
         try:
-            txs_to_index = []
-            for transaction in sorted_transactions:
-                reflect_transaction(transaction=transaction,
-                                    logger=logger,
-                                    block_height=block_height)
-
-                txs_to_index.append((transaction['txid'],
-                                     block['block_number'],
-                                     transaction['sender'],
-                                     transaction['recipient']))
-
-            tx_handler = DbHandler(db_file=db_path)
-            tx_handler.db_executemany("INSERT INTO tx_index VALUES (?,?,?,?)", txs_to_index)
+            tx_handler = open_tx_index(db_path)
+            indexed = tx_handler.db_executemany("INSERT INTO tx_index VALUES (?,?,?,?)", txs_to_index)
             tx_handler.close()
+            assert indexed, f"Transaction index {db_path} was not updated"
             break
 
         except Exception as e:
@@ -401,47 +472,57 @@ if __name__ == "__main__":
                                    unreachable={},
                                    port=port))
 
-    for x in range(0, 50000):
-        try:
-            draft = draft_transaction(sender=address,
-                                      recipient=recipient,
-                                      amount=to_raw_amount(amount),
-                                      data=data,
-                                      public_key=public_key,
-                                      timestamp=get_timestamp_seconds(),
-                                      target_block=asyncio.run(get_target_block(target=ips[0],
-                                                                                port=port,
-                                                                                logger=logger)))
-            fee = asyncio.run(get_recommneded_fee(
-                target=ips[0],
-                port=port,
-                base_fee=get_base_fee(transaction=draft),
-                logger=logger))
-
-            if fee > 500:
-                fee = 500
-
-            transaction = create_transaction(draft=draft,
-                                             private_key=private_key,
-                                             fee=fee
-                                             )
-
-            print(transaction)
-            print(validate_transaction(transaction, logger=logger, block_height=111112))
-
-            fails = []
-            results = asyncio.run(compound_send_transaction(ips=ips,
-                                                            port=port,
-                                                            fail_storage=fails,
-                                                            logger=logger,
-                                                            transaction=transaction,
-                                                            semaphore=asyncio.Semaphore(50)))
-
-            print(f"Submitted to {len(results)} nodes successfully")
-
-            # time.sleep(5)
-        except Exception as e:
-            print(e)
-            raise
+    async def submit_transactions(count):
+        """one event loop and one session for the whole run, connections are kept alive between transactions"""
+        semaphore = asyncio.Semaphore(50)
+
+        async with make_session() as session:
+            for x in range(0, count):
+                try:
+                    draft = draft_transaction(sender=address,
+                                              recipient=recipient,
+                                              amount=to_raw_amount(amount),
+                                              data=data,
+                                              public_key=public_key,
+                                              timestamp=get_timestamp_seconds(),
+                                              target_block=await get_target_block(target=ips[0],
+                                                                                  port=port,
+                                                                                  logger=logger,
+                                                                                  session=session))
+                    fee = await get_recommneded_fee(
+                        target=ips[0],
+                        port=port,
+                        base_fee=get_base_fee(transaction=draft),
+                        logger=logger,
+                        session=session)
+
+                    if fee > 500:
+                        fee = 500
+
+                    transaction = create_transaction(draft=draft,
+                                                     private_key=private_key,
+                                                     fee=fee
+                                                     )
+
+                    print(transaction)
+                    print(validate_transaction(transaction, logger=logger, block_height=111112))
+
+                    fails = []
+                    results = await compound_send_transaction(ips=ips,
+                                                              port=port,
+                                                              fail_storage=fails,
+                                                              logger=logger,
+                                                              transaction=transaction,
+                                                              semaphore=semaphore,
+                                                              session=session)
+
+                    print(f"Submitted to {len(results)} nodes successfully")
+
+                    # time.sleep(5)
+                except Exception as e:
+                    print(e)
+                    raise
+
+    asyncio.run(submit_transactions(50000))
 
     # tx_pool = json.loads(requests.get(f"http://{ip}:{port}/transaction_pool").text, timeout=5)
@@ -1,6 +1,6 @@
 import time
 
-from ops.account_ops import change_balance, increase_produced_count, index_totals, get_totals
+from ops.account_ops import reflect_block
 from ops.block_ops import load_block_from_hash, set_latest_block_info, unindex_block
 from ops.transaction_ops import unindex_transactions
 
@@ -15,25 +15,11 @@ def rollback_one_block(logger, block) -> dict:
             set_latest_block_info(latest_block=previous_block,
                                   logger=logger)
 
-            change_balance(
-                address=block["block_creator"],
-                amount=block["block_reward"],
-                revert=True,
-                logger=logger
-            )
-
-            increase_produced_count(address=block["block_creator"],
-                                    amount=block["block_reward"],
-                                    revert=True,
-                                    logger=logger
-                                    )
-
-            totals = get_totals(block=block, revert=True)
-
-            index_totals(produced=totals["produced"],
-                         fees=totals["fees"],
-                         burned=totals["burned"],
-                         block_height=block["block_number"])
+            reflect_block(block=block,
+                          sorted_transactions=block["block_transactions"],
+                          logger=logger,
+                          transactions_height=block["block_number"],
+                          revert=True)
 
             unindex_transactions(block=block,
                                  logger=logger,